@@ -1,12 +1,14 @@
 from agents.augmenter.result_augmenter import result_augmenter
 from agents.augmenter.plain_augmenter import plain_augmenter
 from agents.augmenter.table_augmenter import table_augmenter
+from agents.augmenter.cached_augmenter import cached_augmenter
 from agents.planner.rational_planner import rational_planner
 from agents.query.query_generator import query_generator
 from agents.retriever.db_retriever import db_retriever
 from agents.tool.value_mapper import value_mapper
 from agents.prioritizer.prioritizer import prioritizer
 from agents.routers import (
+    routing_from_entry,
     routing_from_db_retriever,
     routing_from_rational_planner
 )
\ No newline at end of file
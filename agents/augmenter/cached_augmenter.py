@@ -0,0 +1,77 @@
+from langchain_core.messages import AIMessage, HumanMessage
+from core import DynamoDBChatHistoryManager
+from agents.augmenter.utils import attach_table
+import chainlit as cl
+from typing import Dict, Any
+import asyncio
+import logging
+import json
+
+
+async def cached_augmenter(state: Dict[str, Any], cached: Dict[str, Any], similarity: float) -> Dict[str, Any]:
+    """
+    Answer with the cached answer of a similar question, without invoking the agent graph.
+
+    The cached plan, SQL query and answer are also written to the chat histories of the agents,
+    so the follow-up questions of the session have the same context as after a full run.
+    """
+    user_question = state['messages'][0].content
+
+    # Start the span
+    span = state['trace'].span(
+        name = "Semantic_Cache",
+        type = 'general',
+        input = {"user_question": user_question},
+        metadata = {"cached_question": cached['question'], "similarity": similarity}
+    )
+
+    try:
+        msg = cl.Message(content = cached['answer'])
+        await msg.send()
+
+        # Display table
+        if cached.get('table_data'):
+            await attach_table(msg, json.loads(cached['table_data']), user_question)
+
+        # Replay the turn into the chat histories.
+        histories = [
+            ("oaklins_rational_planner", cached['rational_plan']),
+            ("oaklins_query_generator", cached.get('sql_query')),
+            ("oaklins_result_augmenter", cached['answer']),
+        ]
+        for table_id, output in histories:
+            if output:
+                history = DynamoDBChatHistoryManager.get_chat_history(table_id, state['session_id'])
+                await asyncio.to_thread(history.add_messages, [HumanMessage(content = user_question), AIMessage(content = output)])
+
+        # log the result and finish the tracking.
+        logging.getLogger(f"{state['user_id']}-{state['session_id']}").info(f"Answered from the semantic cache, similarity {similarity:.3f}")
+        span.update(output = cached['answer'])
+        state['trace'].update(output = cached['answer'])
+        span.end()
+        state['trace'].end()
+
+        # Update the task list.
+        cl.user_session.get("task").status = cl.TaskStatus.DONE
+        await cl.user_session.get("task_list").send()
+
+        return {
+            "messages": [state['messages'][0], AIMessage(content = cached['answer'])],
+            "user_id": state['user_id'],
+            "session_id": state['session_id'],
+            "sender": "semantic_cache"
+        }
+
+    except Exception as e:
+        # log the error and finish the tracking.
+        logging.getLogger(f"{state['user_id']}-{state['session_id']}").error(f"Error while answering from the semantic cache: {e}")
+        span.update(output = str(e))
+        state['trace'].update(output = str(e))
+        span.end()
+        state['trace'].end()
+
+        # Update the task list.
+        cl.user_session.get("task").status = cl.TaskStatus.FAILED
+        await cl.user_session.get("task_list").send()
+
+        raise
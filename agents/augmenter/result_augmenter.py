@@ -100,6 +100,7 @@ async def result_augmenter(state: Dict[str, Any], chain: RocloRunnableChain) ->
 
         # Invoke the chain (streaming)
         result = ""
+        response = None
         msg = cl.Message(content = "")
         async for chunk in chain.astream(
             input_msg, 
@@ -112,11 +113,12 @@ async def result_augmenter(state: Dict[str, Any], chain: RocloRunnableChain) ->
         ):
             await msg.stream_token(chunk.content)
             result += chunk.content
+            response = chunk if response is None else response + chunk
         await msg.update()
 
         # log the result and finish the tracking.
         logging.getLogger(f"{state['user_id']}-{state['session_id']}").info("Invoked Result Augmenter")
-        span.update(output = result)
+        span.update(output = result, metadata = RocloRunnableChain.get_usage(response))
         state['trace'].update(output = result)
         span.end()
         state['trace'].end()
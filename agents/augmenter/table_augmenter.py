@@ -59,11 +59,7 @@ import chainlit as cl
 from typing import Dict, Any
 import logging
 import json
-from utils import (
-    convert_list_of_dicts_to_df,
-    save_csv,
-    truncate_descriptions
-)
+from agents.augmenter.utils import attach_table
 
 async def table_augmenter(state: Dict[str, Any], chain: RocloRunnableChain) -> Dict[str, Any]:
     """
@@ -93,6 +89,7 @@ async def table_augmenter(state: Dict[str, Any], chain: RocloRunnableChain) -> D
     try:     
         # Invoke the chain (streaming)
         result = ""
+        response = None
         msg = cl.Message(content = "")
         async for chunk in chain.astream(
             input_msg, 
@@ -105,34 +102,16 @@ async def table_augmenter(state: Dict[str, Any], chain: RocloRunnableChain) -> D
         ):
             await msg.stream_token(chunk.content)
             result += chunk.content
+            response = chunk if response is None else response + chunk
         # await msg.update()
 
         # Display table
         retrieved_data = json.loads(state['messages'][-1].content)
-        
-        # Save csv
-        await save_csv(retrieved_data, msg.id)
-
-        # Truncate the descriptions
-        truncated_data = await truncate_descriptions(retrieved_data)
-
-        converted_dataframe = await convert_list_of_dicts_to_df(truncated_data)
-        msg.elements = [cl.Dataframe(data=converted_dataframe, display="inline", name="Dataframe")]
-        await msg.update()
-
-        # Attach the file
-        msg.elements.append(cl.File(
-            name = f"{state['messages'][0].content}.csv",
-            path = f"./csv/{msg.id}.csv",
-            display="inline",
-            mime='application/csv'
-        ))
-
-        await msg.update()
+        await attach_table(msg, retrieved_data, state['messages'][0].content)
 
         # log the result and finish the tracking.
         logging.getLogger(f"{state['user_id']}-{state['session_id']}").info("Invoked Result Augmenter")
-        span.update(output = result)
+        span.update(output = result, metadata = RocloRunnableChain.get_usage(response))
         state['trace'].update(output = result)
         span.end()
         state['trace'].end()
@@ -143,7 +122,8 @@ async def table_augmenter(state: Dict[str, Any], chain: RocloRunnableChain) -> D
 
         return {
             "messages":AIMessage(content = result),
-            "sender":"result_augmenter"
+            "sender":"result_augmenter",
+            "table_data":state['messages'][-1].content
         }
     
     except Exception as e:
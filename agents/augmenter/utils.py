@@ -0,0 +1,32 @@
+import chainlit as cl
+from typing import Any, Dict, List
+from utils import (
+    convert_list_of_dicts_to_df,
+    save_csv,
+    truncate_descriptions
+)
+
+
+async def attach_table(msg: cl.Message, retrieved_data: List[Dict[str, Any]], user_question: str) -> None:
+    """
+    Display the retrieved data under the message, as a dataframe and a downloadable CSV file.
+    """
+    # Save csv
+    await save_csv(retrieved_data, msg.id)
+
+    # Truncate the descriptions
+    truncated_data = await truncate_descriptions(retrieved_data)
+
+    converted_dataframe = await convert_list_of_dicts_to_df(truncated_data)
+    msg.elements = [cl.Dataframe(data=converted_dataframe, display="inline", name="Dataframe")]
+    await msg.update()
+
+    # Attach the file
+    msg.elements.append(cl.File(
+        name = f"{user_question}.csv",
+        path = f"./csv/{msg.id}.csv",
+        display="inline",
+        mime='application/csv'
+    ))
+
+    await msg.update()
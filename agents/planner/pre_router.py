@@ -0,0 +1,78 @@
+from core import RocloEmbeddingProvider
+from utils import pre_router_config
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import asyncio
+import time
+import re
+
+# Normalized embeddings of the trivial and data examples, computed on first use.
+_example_vectors: Optional[Dict[str, np.ndarray]] = None
+
+_trivial_pattern = re.compile(
+    r"^\s*(" + "|".join(pre_router_config['trivial_patterns']) + r")[\s\W]*$",
+    re.IGNORECASE
+)
+
+
+async def classify_message(message: str) -> Tuple[str, str]:
+    """
+    Classify the message as "trivial" (answered without data) or "data" (needs the rational planner).
+
+    Rules catch greetings, thanks and farewells. The other short messages are compared with
+    the examples of both classes, and are trivial only if clearly closer to the trivial ones.
+    When in doubt, the message goes to the planner.
+
+    Args:
+        message (str): User message.
+
+    Returns:
+        Tuple[str, str]: The class, and the reason of the decision.
+    """
+    if _trivial_pattern.match(message):
+        return "trivial", "rule"
+
+    if len(message.split()) > pre_router_config['max_words']:
+        return "data", "length"
+
+    vectors = await _get_example_vectors()
+    query = np.asarray(await RocloEmbeddingProvider.embed_query(message), dtype = np.float32)
+    query = query / (np.linalg.norm(query) or 1)
+
+    trivial_similarity = float(np.max(vectors['trivial'] @ query))
+    data_similarity = float(np.max(vectors['data'] @ query))
+    reason = f"similarity trivial={trivial_similarity:.3f} data={data_similarity:.3f}"
+
+    if trivial_similarity >= pre_router_config['min_similarity'] and trivial_similarity - data_similarity >= pre_router_config['margin']:
+        return "trivial", reason
+    return "data", reason
+
+
+async def classify_entry(message: str) -> Dict[str, Any]:
+    """
+    Classify the message, falling back to "data" if the classifier fails.
+
+    Returns:
+        Dict[str, Any]: The label, the reason and the seconds the classification took.
+    """
+    started_at = time.perf_counter()
+    try:
+        label, reason = await classify_message(message)
+    except Exception as e:
+        # The planner can answer everything, fall back to it.
+        label, reason = "data", f"classifier failed: {e}"
+    return {"label": label, "reason": reason, "seconds": time.perf_counter() - started_at}
+
+
+async def _get_example_vectors() -> Dict[str, np.ndarray]:
+    """Embed the examples once, through the embedding provider and its cache."""
+    global _example_vectors
+    if _example_vectors is None:
+        vectors = {}
+        for label in ["trivial", "data"]:
+            examples = pre_router_config[f'{label}_examples']
+            embedded = np.stack(await asyncio.gather(*(RocloEmbeddingProvider.embed_query(example) for example in examples))).astype(np.float32)
+            vectors[label] = embedded / np.linalg.norm(embedded, axis = 1, keepdims = True)
+        _example_vectors = vectors
+
+    return _example_vectors
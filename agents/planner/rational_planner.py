@@ -72,19 +72,29 @@
 # Add sophisticated deployment automation
 # Implement intelligent health monitoring
 from core import RocloRunnableChain
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from agents.query.utils import postprocess_sql
 import chainlit as cl
 import logging
+import asyncio
 from langchain_core.messages import AIMessage
 
 
-async def rational_planner(state: Dict[str, Any], chain: RocloRunnableChain) -> Dict[str, Any]:
+async def rational_planner(
+    state: Dict[str, Any],
+    chain: RocloRunnableChain,
+    speculative_chain: Optional[RocloRunnableChain] = None
+) -> Dict[str, Any]:
     """  
     Generate a rational plan for answering a question.  
 
+    With a speculative chain, the SQL query is generated from the user question while the plan
+    is generated, and kept for the query generator if the plan is a data question.
+
     Args:  
         state (Dict[str, Any]): The current state containing user and session information.  
         chain (RocloRunnableChain): The chain used for generating the rational plan.  
+        speculative_chain (Optional[RocloRunnableChain]): The query generator chain, to generate the SQL query in parallel.
 
     Returns:  
         Dict[str, Any]: A dictionary containing the result of the rational planner invocation.  
@@ -101,6 +111,10 @@ async def rational_planner(state: Dict[str, Any], chain: RocloRunnableChain) ->
         input = input_msg
     )
 
+    speculation = None
+    if speculative_chain is not None:
+        speculation = asyncio.create_task(_generate_speculative_sql(state, speculative_chain))
+
     try:
         # Invoke the chain
         result =  await chain.ainvoke(
@@ -115,19 +129,34 @@ async def rational_planner(state: Dict[str, Any], chain: RocloRunnableChain) ->
         
         # Log the result and update the span
         logging.getLogger(f"{state['user_id']}-{state['session_id']}").info("Invoked Rational Planner")
-        span.update(output = result.content, metadata = result.usage_metadata)
+        span.update(output = result.content, metadata = RocloRunnableChain.get_usage(result))
         span.end()
         
         # Update the task status.
         cl.user_session.get('task').status = cl.TaskStatus.DONE
         await cl.user_session.get("task_list").send()
         
+        # Keep the speculative SQL query for data questions only, the others are answered without data.
+        speculative_sql = None
+        if speculation is not None:
+            if "no rational plan is required" in result.content.lower():
+                # Don't wait for a query the answer won't use.
+                speculation.cancel()
+                logging.getLogger(f"{state['user_id']}-{state['session_id']}").info("Discarded the speculative SQL query")
+            else:
+                speculative_sql = await speculation
+
         return {
             'messages': AIMessage(content = result.content),
-            'sender': 'rational_planner'
+            'sender': 'rational_planner',
+            'speculative_sql': speculative_sql
         }
     
     except Exception as e:
+        if speculation is not None:
+            speculation.cancel()
+
+
         # Log the error and update the span.
         logging.getLogger(f"{state['user_id']}-{state['session_id']}").error(f"Error while invoking Rational Planner: {e}")
         span.update(output = str(e))
@@ -138,7 +167,53 @@ async def rational_planner(state: Dict[str, Any], chain: RocloRunnableChain) ->
         await cl.user_session.get("task_list").send()
 
         raise
-    
 
 
 
+async def _generate_speculative_sql(state: Dict[str, Any], chain: RocloRunnableChain) -> Optional[Dict[str, Any]]:
+    """
+    Generate the SQL query from the user question alone, without saving the turn in the chat history.
+
+    Returns:
+        Optional[Dict[str, Any]]: The input, the output and the SQL query, or None if the generation failed.
+    """
+    input_msg = {
+        "user_question": f"This is the user question:\n<user_question>\n{state['messages'][-1].content}\n</user_question>",
+        "rational_plan": ""
+    }
+
+    # Start the span.
+    span = state['trace'].span(
+        name = "Speculative_Query_Generator",
+        type = 'llm',
+        input = input_msg
+    )
+
+    try:
+        result = await chain.ainvoke_without_saving(
+            input_msg,
+            config = {
+                "configurable": {
+                    "table_id": "oaklins_query_generator",
+                    "session_id": state['session_id']
+                }
+            }
+        )
+        sql = postprocess_sql(result.content)
+
+        span.update(output = sql, metadata = RocloRunnableChain.get_usage(result))
+        span.end()
+        return {"input": input_msg, "output": result.content, "sql": sql}
+
+    except asyncio.CancelledError:
+        # The plan needs no data.
+        span.update(output = "cancelled")
+        span.end()
+        raise
+
+    except Exception as e:
+        # The query generator runs again after the plan, the speculation is only an optimization.
+        logging.getLogger(f"{state['user_id']}-{state['session_id']}").warning(f"Error while generating the speculative SQL query: {e}")
+        span.update(output = str(e))
+        span.end()
+        return None
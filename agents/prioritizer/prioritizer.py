@@ -56,7 +56,9 @@
 from langchain_core.messages import HumanMessage
 from core import (
     RocloRunnableChain,
-    RocloMilvusVectorDB
+    RocloMilvusVectorDB,
+    RocloPostgresDatabase,
+    RocloEmbeddingProvider
 )
 from typing import Dict, Any
 import logging
@@ -66,7 +68,7 @@ from agents.prioritizer.utils import (
     get_deal_ids
 )
 import json
-from kg_population.vector_calculator.vector_schmea import vector_schema
+from kg_population.vector_calculator.vector_schmea import vector_schema, pgvector_schema
 
 async def prioritizer(state: Dict[str, Any], chain: RocloRunnableChain) -> Dict[str, Any]:
     """  
@@ -111,10 +113,18 @@ async def prioritizer(state: Dict[str, Any], chain: RocloRunnableChain) -> Dict[
             )
             business_description = result.content
             input_msg["business_description"] = business_description
-            span.update(input=input_msg)
+            span.update(input=input_msg, metadata = RocloRunnableChain.get_usage(result))
 
             # Prioritize the Deals
-            prioritized_lables = RocloMilvusVectorDB.search_data(business_description, vector_schema['collection_name'], deal_ids, ["deal_id", "title"], 0.35)
+            if vector_schema['backend'] == "pgvector":
+                # Ordered in Postgres, on the same pool as the retrieval query.
+                query_vector = await RocloEmbeddingProvider.embed_query(business_description)
+                prioritized_lables = await RocloPostgresDatabase.search_embeddings(pgvector_schema, query_vector, deal_ids, 0.35)
+            elif vector_schema['hybrid']['enabled']:
+                # The BM25 leg matches the company names and niche terms of the user question.
+                prioritized_lables = await RocloMilvusVectorDB.hybrid_search(business_description, vector_schema['collection_name'], deal_ids, ["deal_id", "title"], keyword_query_str = user_question)
+            else:
+                prioritized_lables = await RocloMilvusVectorDB.search_data(business_description, vector_schema['collection_name'], deal_ids, ["deal_id", "title"], 0.35, group_by_field = "deal_id")
             prioritized_deal_ids = get_deal_ids(prioritized_lables)
 
             # If all is filtered out
@@ -128,6 +138,7 @@ async def prioritizer(state: Dict[str, Any], chain: RocloRunnableChain) -> Dict[
             # update output_msg
             output_msg['retrieved_data'] = retrieved_data
             output_msg['prioritized_lables'] = prioritized_lables
+            output_msg['embedding_batches'] = RocloEmbeddingProvider.get_batch_stats()
             logging.getLogger(f"{state['user_id']}-{state['session_id']}").info(f"Prioritized is passed")
 
         retrieved_data = json.dumps(retrieved_data, cls=DateTimeEncoder)
@@ -59,10 +59,7 @@
 from langchain_core.messages import AIMessage
 from core import RocloRunnableChain
 from typing import Dict, Any
-from agents.query.utils import (
-    extract_sql,
-    add_descriptions
-)
+from agents.query.utils import postprocess_sql
 import logging
 import chainlit as cl
 
@@ -91,39 +88,49 @@ async def query_generator(state: Dict[str, Any], chain: RocloRunnableChain) -> D
             "rational_plan": ""
         }
 
+    # Reuse the SQL query generated during the planning, for the first attempt of a data question.
+    speculative = state.get('speculative_sql') if state['sender'] == 'rational_planner' else None
+    config = {
+        "configurable": {
+            "table_id": "oaklins_query_generator",
+            "session_id": state['session_id']
+        }
+    }
+
     # Start span.
     span = state['trace'].span(
         name = "Query_Generator",
         type = 'llm',
-        input = input_msg
+        input = speculative['input'] if speculative else input_msg,
+        metadata = {"speculative": bool(speculative)}
     )
 
     try:
-        # Invoke the chain to generate the SQL query
-        result = await chain.ainvoke(
-            input_msg,
-            config = {
-                "configurable": {
-                    "table_id": "oaklins_query_generator",
-                    "session_id": state['session_id']
-                }
-            }
-        )
+        if speculative:
+            # The speculative call didn't save its turn, keep it now that it is accepted.
+            await chain.save_turn(speculative['input'], AIMessage(content = speculative['output']), config)
+            modified_sql = speculative['sql']
+            logging.getLogger(f"{state['user_id']}-{state['session_id']}").info(f"Reused the speculative SQL query")
+            span.update(output = modified_sql)
+            span.end()
 
-        # Extract the generated SQL query from the result.
-        generated_sql = extract_sql(result.content)
+        else:
+            # Invoke the chain to generate the SQL query
+            result = await chain.ainvoke(input_msg, config = config)
 
-        # Add descriptions in sql
-        modified_sql = add_descriptions(generated_sql)
+            # Extract the SQL query, add the descriptions and rewrite the search predicates.
+            modified_sql = postprocess_sql(result.content)
 
-        # Update the span.
-        logging.getLogger(f"{state['user_id']}-{state['session_id']}").info(f"Invoked SQL Generator")
-        span.update(output = modified_sql, metadata = result.usage_metadata)
-        span.end()
+            # Update the span.
+            logging.getLogger(f"{state['user_id']}-{state['session_id']}").info(f"Invoked SQL Generator")
+            span.update(output = modified_sql, metadata = RocloRunnableChain.get_usage(result))
+            span.end()
         
         return {
             "messages": AIMessage(content = modified_sql),
-            "sender": "query_generator"
+            "sender": "query_generator",
+            "sql_query": modified_sql,
+            "speculative_sql": None
         }
     
     except Exception as e:
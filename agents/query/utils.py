@@ -1,5 +1,7 @@
 import re
+from typing import List, Optional, Tuple
 from sqlglot import parse_one, exp
+from utils import postgres_table_schema
 
 def extract_sql(text: str) -> str:
     """  
@@ -90,4 +92,121 @@ def add_descriptions(original_sql: str) -> str:
     
     # Render back to PostgreSQL, preserving TOP and other clauses
     new_sql = ast.sql(dialect="postgres")
-    return new_sql
\ No newline at end of file
+    return new_sql
+
+
+def rewrite_search_predicates(original_sql: str) -> str:
+    """
+    Rewrite OR-chained substring matches over all the search text columns into one predicate on search_text.
+
+    'target_industry LIKE '%shoe%' OR target_sector LIKE '%shoe%' OR ...' over every column of
+    search_text becomes 'search_text LIKE '%shoe%'', which is served by the trigram index. The columns
+    are joined by a separator in search_text, so the rewrite is only done when it gives the same rows:
+    the term has no wildcard, escape or separator inside, and the chain is only combined with AND/OR in WHERE.
+
+    Args:
+        original_sql (str): The generated SQL query.
+
+    Returns:
+        str: The rewritten SQL query, or the original one if nothing was rewritten.
+    """
+    search_columns = set(postgres_table_schema['search_text_columns'])
+
+    try:
+        ast = parse_one(original_sql, read="postgres")
+    except Exception:
+        return original_sql
+
+    rewritten = False
+    for where in list(ast.find_all(exp.Where)):
+        for chain in _find_or_chains(where.this):
+            disjuncts = list(chain.flatten())
+
+            # Group the substring matches by operator, table qualifier and term.
+            groups = {}
+            for i, disjunct in enumerate(disjuncts):
+                key = _get_substring_match_key(disjunct.unnest())
+                if key is not None:
+                    groups.setdefault(key[:3], []).append((i, key[3]))
+
+            replaced = {}
+            for (operator, table, pattern), matches in groups.items():
+                if {column for _, column in matches} != search_columns:
+                    continue
+
+                first = matches[0][0]
+                replaced[first] = operator(
+                    this = exp.column("search_text", table = table or None),
+                    expression = exp.Literal.string(pattern)
+                )
+                for i, _ in matches[1:]:
+                    replaced[i] = None
+
+            if not replaced:
+                continue
+
+            new_disjuncts = [replaced.get(i, disjunct) for i, disjunct in enumerate(disjuncts) if replaced.get(i, disjunct) is not None]
+            new_chain = exp.or_(*new_disjuncts, copy = False)
+            if len(new_disjuncts) > 1 and not isinstance(chain.parent, (exp.Paren, exp.Where)):
+                new_chain = exp.paren(new_chain, copy = False)
+            chain.replace(new_chain)
+            rewritten = True
+
+    return ast.sql(dialect="postgres") if rewritten else original_sql
+
+
+
+def postprocess_sql(text: str) -> str:
+    """
+    Turn the output of the query generator into the SQL query sent to the database.
+
+    Args:
+        text (str): The output of the query generator.
+
+    Returns:
+        str: The extracted SQL query, with descriptions and indexed search predicates.
+    """
+    # Extract the generated SQL query from the result.
+    generated_sql = extract_sql(text)
+
+    # Add descriptions in sql
+    modified_sql = add_descriptions(generated_sql)
+
+    # Rewrite the substring matches over all the search columns into an indexed search_text predicate
+    return rewrite_search_predicates(modified_sql)
+
+
+
+def _find_or_chains(node: exp.Expression) -> List[exp.Or]:
+    """
+    Find the outermost OR nodes reachable from the WHERE condition through AND, OR and parentheses only.
+    """
+    node = node.unnest()
+
+    if isinstance(node, exp.Or):
+        return [node]
+    if isinstance(node, exp.And):
+        return _find_or_chains(node.left) + _find_or_chains(node.right)
+    return []
+
+
+
+def _get_substring_match_key(node: exp.Expression) -> Optional[Tuple[type, str, str, str]]:
+    """
+    Return (operator, table, pattern, column) if the node is 'column LIKE/ILIKE '%term%'' with a plain term.
+    """
+    if not isinstance(node, (exp.Like, exp.ILike)) or node.args.get("escape"):
+        return None
+
+    column, pattern = node.this, node.expression
+    if not isinstance(column, exp.Column) or not isinstance(pattern, exp.Literal) or not pattern.is_string:
+        return None
+
+    value = pattern.this
+    term = value[1:-1]
+    if len(value) < 3 or not value.startswith("%") or not value.endswith("%"):
+        return None
+    if any(char in term for char in ("%", "_", "\\", postgres_table_schema['search_text_separator'])):
+        return None
+
+    return type(node), column.table, value, column.name
@@ -51,8 +51,9 @@
 # Implement sophisticated data migration
 # Implement advanced workflow automation
 # Add advanced error recovery mechanisms
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from core import RocloPostgresDatabase
+from utils import postgres_query_limits, postgres_table_schema
 from langchain_core.messages import HumanMessage
 import logging
 import tiktoken
@@ -60,6 +61,7 @@ import json
 
 encoding = tiktoken.get_encoding('cl100k_base')
 
+
 async def db_retriever(state: Dict[str, Any]) -> Dict[str, Any]:
     """  
     Execute the generated SQL query and return the result.  
@@ -81,20 +83,41 @@ async def db_retriever(state: Dict[str, Any]) -> Dict[str, Any]:
 
     try:
         # retrieval_result = await RocloGraphDatabase.execute_query(query)
-        retrieval_result = await RocloPostgresDatabase.execute_query(query)
-        if not retrieval_result:  
-            retrieval_result = "No data was retrieved from the query. The result set is empty." +\
-                "The SQL query syntax appears to be correct. However, the lack of results may be due to overly restrictive conditions or incorrect parameters. " +\
-                "Please review and provide the exact SQL query for further analysis."
-        
-        # elif len(encoding.encode(str(retrieval_result))) > 100000:
-        elif len(retrieval_result) > 100:
-            retrieval_result =  "The data retrieval process has exceeded the expected volume. Please verify that your SQL query is correctly formulated, " +\
-                "utilizing precise entity references at each step. Additionally, consider implementing data retrieval limits within your query to optimize performance."
-            
+        # Reject the query before it runs if the planner expects it to be too expensive.
+        cost_report = await _check_query_cost(query)
+
+        if cost_report:
+            logging.getLogger(f"{state['user_id']}-{state['session_id']}").info("Query rejected by the cost gate: %s", cost_report)
+            retrieval_result = "The data retrieval process has exceeded the expected volume before execution. " +\
+                "The query planner estimates that this SQL query is too expensive to run:\n" +\
+                f"<query_cost>\n{json.dumps(cost_report)}\n</query_cost>\n" +\
+                "Please revise the SQL query with more selective conditions, avoid unfiltered joins and full table scans, " +\
+                "and consider implementing data retrieval limits within your query."
+
         else:
+            # Fetch at most max_rows + 1 rows, enough to tell that the result is too large.
+            retrieval_result = await RocloPostgresDatabase.execute_query(query, max_rows = postgres_query_limits['max_rows'])
+
+            if not retrieval_result:  
+                retrieval_result = "No data was retrieved from the query. The result set is empty." +\
+                    "The SQL query syntax appears to be correct. However, the lack of results may be due to overly restrictive conditions or incorrect parameters. " +\
+                    "Please review and provide the exact SQL query for further analysis."
             
-            retrieval_result = json.dumps(retrieval_result)
+            # elif len(encoding.encode(str(retrieval_result))) > 100000:
+            elif len(retrieval_result) > postgres_query_limits['max_rows']:
+                retrieval_result =  "The data retrieval process has exceeded the expected volume. Please verify that your SQL query is correctly formulated, " +\
+                    "utilizing precise entity references at each step. Additionally, consider implementing data retrieval limits within your query to optimize performance."
+                
+            else:
+                # Don't hand the generated search columns of a 'SELECT *' to the augmenters.
+                # New rows, the returned ones may be the entries of the result cache.
+                search_columns = set(postgres_table_schema['search_columns'])
+                retrieval_result = [
+                    {column: value for column, value in row.items() if column not in search_columns}
+                    for row in retrieval_result
+                ]
+
+                retrieval_result = json.dumps(retrieval_result)
 
     except Exception as e:
         retrieval_result = "I encountered an issue while attempting to retrieve the data. It appears there is a syntax error in the sql query." +\
@@ -105,10 +128,37 @@ async def db_retriever(state: Dict[str, Any]) -> Dict[str, Any]:
 
     # Log the result and update the span
     logging.getLogger(f"{state['user_id']}-{state['session_id']}").info("Invoked DB Retriever")
-    span.update(output = str(retrieval_result))
+    span.update(output = str(retrieval_result), metadata = RocloPostgresDatabase.get_pool_metrics())
     span.end()
 
     return {
         "messages":HumanMessage(content = retrieval_result),
         "sender":"db_retriever"
-    }
\ No newline at end of file
+    }
+
+
+async def _check_query_cost(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Run EXPLAIN on the query and compare the planner estimates with the configured limits.
+
+    Args:
+        query (str): The generated SQL query.
+
+    Returns:
+        Optional[Dict[str, Any]]: The estimates and the exceeded limits if the query is too expensive, otherwise None.
+    """
+    plan = await RocloPostgresDatabase.explain_query(query)
+
+    report = {
+        "node_type": plan['Node Type'],
+        "estimated_total_cost": plan['Total Cost'],
+        "estimated_rows": plan['Plan Rows'],
+        "exceeded_limits": []
+    }
+
+    if plan['Total Cost'] > postgres_query_limits['max_total_cost']:
+        report['exceeded_limits'].append(f"estimated_total_cost > {postgres_query_limits['max_total_cost']}")
+    if plan['Plan Rows'] > postgres_query_limits['max_plan_rows']:
+        report['exceeded_limits'].append(f"estimated_rows > {postgres_query_limits['max_plan_rows']}")
+
+    return report if report['exceeded_limits'] else None
@@ -2,6 +2,44 @@ import chainlit as cl
 from typing import Dict, Any
 import json
 import logging
+from agents.planner.pre_router import classify_entry
+
+async def routing_from_entry(state: Dict[str, Any]) -> str:
+    """
+    Send the trivial messages (greetings, thanks, questions about the bot) straight to the plain augmenter,
+    and the others to the rational planner.
+
+    Args:
+        state (Dict[str, Any]): The initial state containing the user message.
+
+    Returns:
+        str: The routing target.
+    """
+    message = state['messages'][-1].content
+    span = state['trace'].span(
+        name = "Pre_Router",
+        type = 'general',
+        input = {"user_question": message}
+    )
+
+    # The chain may have classified the message already, to skip the semantic cache for trivial ones.
+    message_class = state.get('message_class') or await classify_entry(message)
+    label, reason = message_class['label'], message_class['reason']
+    span.update(output = message_class)
+    span.end()
+    logging.getLogger(f"{state['user_id']}-{state['session_id']}").info(f"Pre-router: {label} ({reason})")
+
+    if label == "trivial":
+        cl.user_session.get("task").status = cl.TaskStatus.DONE
+        task_2 = cl.Task(title = "Answering your question", status = cl.TaskStatus.RUNNING)
+        cl.user_session.set("task", task_2)
+        await cl.user_session.get("task_list").add_task(task_2)
+        await cl.user_session.get("task_list").send()
+        return "plain_augmenter"
+
+    return "rational_planner"
+
+
 
 async def routing_from_rational_planner(state: Dict[str, Any]) -> str:
     """  
@@ -3,4 +3,5 @@ from build.rational_planner import create_rational_planner_chain
 from build.result_augmenter import create_result_augmenter_chain
 from build.plain_augmenter import create_plain_augmenter_chain
 from build.table_augmenter import create_table_augmenter_chain
-from build.prioritizer import create_prioritizer_chain
\ No newline at end of file
+from build.prioritizer import create_prioritizer_chain
+from build.history_summarizer import create_history_summarizer_chain
@@ -0,0 +1,39 @@
+from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+import logging
+from config import Credentials
+
+
+history_summarizer_system_prompt = """You summarize the earlier part of a conversation between a user and the Oaklins assistant.
+Keep what the next answers may rely on: the questions asked, the companies, deals, sectors, countries and dates mentioned, the filters applied and the conclusions given.
+Leave out the raw retrieved data. If a previous summary is given, merge the new turns into it.
+Answer with the summary only, in at most 300 words."""
+
+
+def create_history_summarizer_chain() -> Runnable:
+    """
+    Create the chain summarizing the older turns of the chat histories.
+
+    Returns:
+        Runnable: A chain taking the previous summary and the conversation, and returning the new summary.
+    """
+    try:
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", history_summarizer_system_prompt),
+                ("user", "Previous summary:\n{summary}\n\nConversation:\n{conversation}"),
+            ]
+        )
+
+        llm = ChatOpenAI(
+            model="gpt-4o-mini",
+            api_key = Credentials.get_secret("OPENAI_API_KEY"),
+            temperature=0
+        )
+
+        return prompt | llm
+
+    except Exception as e:
+        logging.getLogger('main').error(f"Error while creating history summarizer chain: {e}")
+        raise
@@ -7,8 +7,10 @@ from langchain_core.prompts import (
 )
 from operator import itemgetter
 from core import RocloOpikTracker
+from build.history_summarizer import create_history_summarizer_chain
 import logging
 from config import Credentials
+from utils import history_policies
 
 
 def create_plain_augmenter_chain():
@@ -50,7 +52,9 @@ def create_plain_augmenter_chain():
             llm = llm,
             input_key = "user_question",
             history_key = "chat_history",
-            name = "result_augmenter"
+            name = "result_augmenter",
+            history_policy = history_policies['plain_augmenter'],
+            history_summarizer = create_history_summarizer_chain()
         )
     
     except Exception as e:
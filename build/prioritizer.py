@@ -6,9 +6,10 @@ from langchain_core.prompts import (
 )
 from operator import itemgetter
 from core import RocloOpikTracker
+from build.history_summarizer import create_history_summarizer_chain
 import logging
 from config import Credentials
-from utils import replace_prompt
+from utils import replace_prompt, history_policies
 
 
 def create_prioritizer_chain() -> RocloRunnableChain:
@@ -36,7 +37,8 @@ def create_prioritizer_chain() -> RocloRunnableChain:
             model="gpt-4o",
             api_key = Credentials.get_secret("OPENAI_API_KEY"),
             temperature=0,
-            streaming = True
+            streaming = True,
+            stream_usage = True
         )
         
         # Return the configured RocloRunnableChain
@@ -50,7 +52,9 @@ def create_prioritizer_chain() -> RocloRunnableChain:
             llm = llm,
             input_key = "user_question",
             history_key = "chat_history",
-            name = "priortizer"
+            name = "priortizer",
+            history_policy = history_policies['prioritizer'],
+            history_summarizer = create_history_summarizer_chain()
         )
     
     except Exception as e:
@@ -7,9 +7,10 @@ from langchain_core.prompts import (
 )
 from operator import itemgetter
 from core import RocloOpikTracker
+from build.history_summarizer import create_history_summarizer_chain
 import logging
 from config import Credentials
-from utils import replace_prompt
+from utils import replace_prompt, history_policies
 
 
 def create_query_generator_chain() -> RocloRunnableChain:
@@ -45,7 +46,8 @@ def create_query_generator_chain() -> RocloRunnableChain:
             model="gpt-4o",
             api_key = Credentials.get_secret("OPENAI_API_KEY"),
             temperature=0,
-            streaming = True
+            streaming = True,
+            stream_usage = True
         )
         
         # Return the configured RocloRunnableChain
@@ -59,7 +61,9 @@ def create_query_generator_chain() -> RocloRunnableChain:
             llm = llm,
             input_key = "user_question",
             history_key = "chat_history",
-            name = "query_generator"
+            name = "query_generator",
+            history_policy = history_policies['query_generator'],
+            history_summarizer = create_history_summarizer_chain()
         )
     
     except Exception as e:
@@ -6,9 +6,10 @@ from langchain_core.prompts import (
 )
 from operator import itemgetter
 from core import RocloOpikTracker
+from build.history_summarizer import create_history_summarizer_chain
 import logging
 from config import Credentials
-from utils import replace_prompt
+from utils import replace_prompt, history_policies
 
 
 def create_rational_planner_chain() -> RocloRunnableChain:
@@ -50,7 +51,9 @@ def create_rational_planner_chain() -> RocloRunnableChain:
             llm = llm,
             input_key = "user_question",
             history_key = "chat_history",
-            name = "rational_planner"
+            name = "rational_planner",
+            history_policy = history_policies['rational_planner'],
+            history_summarizer = create_history_summarizer_chain()
         )
     
     except Exception as e:
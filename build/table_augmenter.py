@@ -7,8 +7,10 @@ from langchain_core.prompts import (
 )
 from operator import itemgetter
 from core import RocloOpikTracker
+from build.history_summarizer import create_history_summarizer_chain
 import logging
 from config import Credentials
+from utils import history_policies
 
 
 def create_table_augmenter_chain():
@@ -36,7 +38,8 @@ def create_table_augmenter_chain():
             model="gpt-4o",
             api_key = Credentials.get_secret("OPENAI_API_KEY"),
             temperature=0,
-            streaming = True
+            streaming = True,
+            stream_usage = True
         )
 
         return RocloRunnableChain(
@@ -50,7 +53,9 @@ def create_table_augmenter_chain():
             llm = llm,
             input_key = "user_question",
             history_key = "chat_history",
-            name = "result_augmenter"
+            name = "result_augmenter",
+            history_policy = history_policies['table_augmenter'],
+            history_summarizer = create_history_summarizer_chain()
         )
     
     except Exception as e:
@@ -20,9 +20,12 @@ from core import (
     RocloPostgresDatabase,
     RocloSupabaseDatabase,
     RocloMilvusVectorDB,
+    RocloEmbeddingProvider,
     DynamoDBChatHistoryManager,
-    RocloOpikTracker
+    RocloOpikTracker,
+    SemanticCache
 )
+from kg_population.vector_calculator.vector_schmea import vector_schema
 from agents import (
     rational_planner,
     query_generator,
@@ -31,10 +34,13 @@ from agents import (
     plain_augmenter,
     table_augmenter,
     db_retriever,
+    routing_from_entry,
     routing_from_rational_planner,
     routing_from_db_retriever,
-    prioritizer
+    prioritizer,
+    cached_augmenter
 )
+from agents.planner.pre_router import classify_entry
 from build import (
     create_query_generator_chain,
     create_result_augmenter_chain,
@@ -49,7 +55,8 @@ from langgraph.graph import END, StateGraph
 import logging
 from langchain_core.messages import HumanMessage
 from opik.api_objects.trace import Trace
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+import re
 
 
 class RocloChatbotChain:
@@ -66,9 +73,14 @@ class RocloChatbotChain:
     
 
     @classmethod
-    def build_workflow(cls) -> None:
+    def build_workflow(cls, speculative_sql: bool = False) -> None:
         """
         Build the multi-agent workflow for the chatbot.
+
+        Args:
+            speculative_sql (bool): Generate the SQL query from the user question while the rational plan
+                is generated, and reuse it for data questions. Saves a model call of latency, at the cost
+                of a discarded call for the questions answered without data.
         """
         if cls._instance is None:
             cls()
@@ -83,30 +95,32 @@ class RocloChatbotChain:
             # Build the chat history manager.
             DynamoDBChatHistoryManager.connect()
 
-            # Initialize the Roclo Postgres Database.
-            RocloPostgresDatabase.connect()
+            # Initialize the Roclo Postgres Database, with a connection per request and a result cache.
+            RocloPostgresDatabase.connect(use_pool = True, result_cache_size = 256, result_cache_ttl = 3600)
 
             # Initialize the Roclo Supabase Database.
             RocloSupabaseDatabase.connect()
 
-            # Initialize the Roclo Milvus Database.
-            RocloMilvusVectorDB.connect()
-
-            # initialize the Opik Tacer.
-            RocloOpikTracker.configure(project_name = 'Oaklins')
+            # Initialize the query embeddings, shared by the vector search backends.
+            RocloEmbeddingProvider.connect()
 
-            # Define the agents nodes.
-            cls._define_nodes()
-            cls._instance.workflow = StateGraph(AgentState)
+            # Initialize the Roclo Milvus Database, reranking small candidate sets in process.
+            # The pgvector backend searches the vectors in Postgres and runs without Milvus.
+            if vector_schema['backend'] == "milvus":
+                RocloMilvusVectorDB.connect(use_local_store = True)
 
-            # Add nodes to worflow.
-            cls._add_workflow_nodes()
+            # Reuse the answers of similar first questions, while the data is unchanged.
+            cls._instance.semantic_cache = SemanticCache(max_size = 512, ttl = 86400, threshold = 0.92)
 
-            # Define edges between nodes.
-            cls._define_workflow_edges()
+            # initialize the Opik Tacer.
+            RocloOpikTracker.configure(project_name = 'Oaklins')
 
             # Build the agent graph.
-            cls._instance.agent_graph = cls._instance.workflow.compile()
+            cls._instance.speculative_sql = speculative_sql
+            cls._instance.agent_graph = cls._compile_workflow()
+
+            # Rebuild the agent graph when new prompt versions are published on Opik.
+            RocloOpikTracker.on_prompt_update(cls._reload_prompts)
 
             logging.getLogger('main').info("Agent Graph builded. Let's start chat!")
 
@@ -116,16 +130,50 @@ class RocloChatbotChain:
         
     
     @classmethod
-    def _define_nodes(cls) -> None:
+    def _compile_workflow(cls):
+        """Define the agent nodes with the current prompts, and compile the agent graph."""
+        # Define the agents nodes.
+        cls._define_nodes(cls._instance.speculative_sql)
+        cls._instance.workflow = StateGraph(AgentState)
+
+        # Add nodes to worflow.
+        cls._add_workflow_nodes()
+
+        # Define edges between nodes.
+        cls._define_workflow_edges()
+
+        return cls._instance.workflow.compile()
+
+
+
+    @classmethod
+    def _reload_prompts(cls, updated: List[str]) -> None:
+        """
+        Swap the agent graph for one built with the updated prompts.
+
+        The running requests finish with the graph they started with.
+
+        Args:
+            updated (List[str]): Names of the updated prompts.
+        """
+        cls._instance.agent_graph = cls._compile_workflow()
+        logging.getLogger('main').info(f"Agent Graph rebuilt with the updated prompts {updated}.")
+
+
+
+    @classmethod
+    def _define_nodes(cls, speculative_sql: bool = False) -> None:
         """Define the agent nodes"""
         try:
+            query_generator_chain = create_query_generator_chain()
             cls._instance.rational_planner = functools.partial(
                 rational_planner,
-                chain = create_rational_planner_chain()
+                chain = create_rational_planner_chain(),
+                speculative_chain = query_generator_chain if speculative_sql else None
             )
             cls._instance.query_generator = functools.partial(
                 query_generator,
-                chain = create_query_generator_chain()
+                chain = query_generator_chain
             )
             cls._instance.result_augmenter = functools.partial(
                 result_augmenter,
@@ -174,7 +222,14 @@ class RocloChatbotChain:
         Define edges between nodes in the workflow.  
         """
         try:
-            cls._instance.workflow.set_entry_point("rational_planner")
+            # Trivial messages skip the rational planner.
+            cls._instance.workflow.set_conditional_entry_point(
+                routing_from_entry,
+                {
+                    "rational_planner":"rational_planner",
+                    "plain_augmenter":"plain_augmenter"
+                }
+            )
             cls._instance.workflow.add_conditional_edges(
                 "rational_planner",
                 routing_from_rational_planner,
@@ -219,15 +274,76 @@ class RocloChatbotChain:
             message (str): User question.
             logger (logging.Logger): logger.
         """
-        return await cls._instance.agent_graph.ainvoke(
-            {
-                "messages": HumanMessage(content = message),
-                "user_id": user_id,
-                "session_id": session_id,
-                "sender": "human",
-                "trace":trace
-            }
-        )
+        state = {
+            "messages": HumanMessage(content = message),
+            "user_id": user_id,
+            "session_id": session_id,
+            "sender": "human",
+            "trace":trace
+        }
+
+        # Only data questions use the semantic cache, trivial messages are cheap to answer.
+        state['message_class'] = await classify_entry(message)
+        cache_lookup = None
+        if state['message_class']['label'] == "data":
+            cache_lookup = await cls._lookup_semantic_cache(message, session_id)
+        if cache_lookup and cache_lookup['hit']:
+            return await cached_augmenter({**state, "messages": [state['messages']]}, cache_lookup['hit'][1], cache_lookup['hit'][0])
+
+        result = await cls._instance.agent_graph.ainvoke(state)
+
+        # Cache the questions answered from the data, not the failed, rejected or plain ones.
+        # The plain augmenter also reports 'result_augmenter', only a data answer has a SQL query.
+        if cache_lookup and result.get('sender') == 'result_augmenter' and result.get('sql_query'):
+            cls._instance.semantic_cache.set(cache_lookup['vector'], cache_lookup['data_version'], {
+                "question": message,
+                "rational_plan": result['messages'][1].content if len(result['messages']) > 2 else None,
+                "sql_query": result.get('sql_query'),
+                "answer": result['messages'][-1].content,
+                "table_data": result.get('table_data')
+            }, exact_key = cache_lookup['numbers'])
+
+        return result
+
+
+    @classmethod
+    async def _lookup_semantic_cache(cls, message: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the answer of a similar question.
+
+        Only the first question of a session is looked up, a follow-up depends on the conversation.
+
+        Returns:
+            Optional[Dict[str, Any]]: The question embedding, the data version and the hit (similarity, cached answer),
+                or None if the question can't use the cache.
+        """
+        try:
+            history = DynamoDBChatHistoryManager.get_chat_history("oaklins_rational_planner", session_id)
+            if await asyncio.to_thread(lambda: history.messages):
+                return None
+
+            data_version = await RocloPostgresDatabase.get_data_version()
+            if data_version is None:
+                return None
+
+            # Questions that only differ in a number or a year are close in the embedding space, match them exactly.
+            numbers = _extract_numbers(message)
+            vector = await RocloEmbeddingProvider.embed_query(message)
+            hit = cls._instance.semantic_cache.get(vector, data_version, exact_key = numbers)
+            logging.getLogger('main').info(f"Semantic cache {'hit' if hit else 'miss'}: {cls._instance.semantic_cache.stats()}")
+
+            return {"vector": vector, "data_version": data_version, "numbers": numbers, "hit": hit}
+
+        except Exception as e:
+            # The cache is an optimization, answer with the agent graph.
+            logging.getLogger('main').info(f"Semantic cache lookup failed: {e}")
+            return None
 
 
         
+
+
+
+def _extract_numbers(message: str) -> Tuple[str, ...]:
+    """Return the numbers of the message, thousands separators removed, in a canonical order."""
+    return tuple(sorted(re.findall(r"\d+(?:\.\d+)?", re.sub(r"(?<=\d),(?=\d{3}\b)", "", message))))
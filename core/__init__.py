@@ -4,7 +4,12 @@ from core.agent_state import AgentState
 from core.graph_database import RocloGraphDatabase
 from core.sql_database import RocloSQLDatabase
 from core.opik_tracker import RocloOpikTracker
+from core.embedding_provider import RocloEmbeddingProvider
 from core.milvus_vector import RocloMilvusVectorDB
 from core.postgres_database import RocloPostgresDatabase
 from core.supabase_database import RocloSupabaseDatabase
-from core.sheet_provider import RocloSheetProvider
\ No newline at end of file
+from core.sheet_provider import RocloSheetProvider
+from core.lru_cache import LRUCache
+from core.semantic_cache import SemanticCache
+from core.local_vector_store import LocalVectorStore
+from core.history_window import WindowedChatMessageHistory
\ No newline at end of file
@@ -56,7 +56,7 @@
 # Add intelligent data validation
 # Implement advanced search optimization
 # Add advanced integration testing
-from typing import Annotated, TypedDict
+from typing import Annotated, Any, Dict, TypedDict
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 from opik.api_objects.trace import Trace
@@ -75,10 +75,22 @@ class AgentState(TypedDict):
             Unique identifier for the session in which the agent is operating.  
         sender (str):   
             Identifier for the sender of the messages (e.g., user or system).
+        sql_query (str):
+            Latest SQL query generated for the question.
+        table_data (str):
+            Retrieved data displayed as a table with the answer, as JSON.
+        speculative_sql (Dict[str, Any]):
+            SQL query generated in parallel with the rational plan, until the query generator uses it.
+        message_class (Dict[str, Any]):
+            Label ("trivial" or "data") and reason given by the pre-router to the user message.
     """
     messages: Annotated[list[BaseMessage], add_messages]
     user_id: str
     session_id: str
     sender: str
     trace: Trace
+    sql_query: str
+    table_data: str
+    speculative_sql: Dict[str, Any]
+    message_class: Dict[str, Any]
 
@@ -0,0 +1,204 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from config import Credentials
+from kg_population.vector_calculator.vector_schmea import vector_schema
+from kg_population.vector_calculator.embedding_function import JinaEmbeddingFunction
+from core.lru_cache import LRUCache
+import numpy as np
+import asyncio
+import hashlib
+import logging
+import os
+
+class RocloEmbeddingProvider:
+    """
+    Singleton class to embed the search queries, shared by the vector search backends.
+
+    The query embeddings are cached in memory and optionally on disk, keyed by the text
+    and the embedding settings. Cache misses from all the sessions are collected for a short
+    window and sent to Jina as one batched request, identical texts sharing one embedding.
+    """
+    _instance: Optional['RocloEmbeddingProvider'] = None
+
+    def __new__(cls):
+        """Create a new instance of RocloEmbeddingProvider if one does not already exist."""
+        if cls._instance is None:
+            cls._instance = super(RocloEmbeddingProvider, cls).__new__(cls)
+            cls._instance.ef = None
+            cls._instance.embedding_cache = None
+            cls._instance.embedding_cache_dir = None
+            cls._instance.batch_window = 0.0
+            cls._instance.max_batch_size = 1
+            cls._instance.futures = {}
+            cls._instance.queue = {}
+            cls._instance.flush_handle = None
+            cls._instance.batch_tasks = set()
+            cls._instance.batch_stats = None
+        return cls._instance
+
+
+    @classmethod
+    def connect(
+        cls,
+        embedding_cache_size: int = 1024,
+        embedding_cache_ttl: Optional[float] = 3600,
+        embedding_cache_dir: Optional[str] = None,
+        batch_window: float = 0.01,
+        max_batch_size: int = 64
+    ):
+        """
+        Initialize the Jina embedding function and the query embedding cache.
+
+        Args:
+            embedding_cache_size (int): Number of query embeddings kept in memory.
+            embedding_cache_ttl (Optional[float]): Seconds a query embedding stays in memory, or None to keep it until it is evicted.
+            embedding_cache_dir (Optional[str]): Directory where query embeddings are also saved, so they survive restarts and evictions.
+            batch_window (float): Seconds a cache miss waits for others to share its embedding request.
+            max_batch_size (int): Number of texts that sends the request before the window ends.
+        """
+        if cls._instance is None:
+            cls()
+
+        # Define the Jina embedding function.
+        cls._instance.ef = JinaEmbeddingFunction(
+            vector_schema['values']['model'],
+            Credentials.get_secret("JINAAI_API_KEY"),
+            task = vector_schema['values']['task'],
+            dimensions = vector_schema['values']['dimensions']
+        )
+        # Cache the query embeddings, so repeated prioritizations skip the Jina API.
+        cls._instance.embedding_cache = LRUCache(max_size = embedding_cache_size, ttl = embedding_cache_ttl)
+        if embedding_cache_dir:
+            os.makedirs(embedding_cache_dir, exist_ok = True)
+        cls._instance.embedding_cache_dir = embedding_cache_dir
+
+        cls._instance.batch_window = batch_window
+        cls._instance.max_batch_size = max_batch_size
+        cls._instance.batch_stats = {"requests": 0, "texts": 0, "deduplicated": 0}
+        logging.getLogger('main').info("Embedding provider configured.")
+
+
+    @classmethod
+    def is_connected(cls) -> bool:
+        """Check that connect() was called."""
+        return cls._instance is not None and cls._instance.ef is not None
+
+
+    @classmethod
+    async def embed_query(cls, query_str: str) -> np.ndarray:
+        """
+        Embed the query, reusing the cached embedding of the same text with the same model settings.
+        """
+        ef = cls._instance.ef
+        text_hash = hashlib.sha256(query_str.encode()).hexdigest()
+        cache_key = (ef.model_name, ef.task, ef.dimensions, text_hash)
+
+        vector = cls._instance.embedding_cache.get(cache_key)
+        if vector is not None:
+            return vector
+
+        spill_path = cls._get_spill_path(cache_key)
+        if spill_path and os.path.exists(spill_path):
+            vector = np.load(spill_path)
+            cls._instance.embedding_cache.set(cache_key, vector)
+            return vector
+
+        future = cls._instance.futures.get(cache_key)
+        if future is None:
+            future = cls._enqueue(cache_key, query_str)
+        else:
+            cls._instance.batch_stats["deduplicated"] += 1
+
+        # Shielded, so a cancelled session doesn't cancel the embedding other sessions wait for.
+        return await asyncio.shield(future)
+
+
+    @classmethod
+    def get_batch_stats(cls) -> Dict[str, Any]:
+        """Return the number of batched requests, embedded texts and deduplicated texts."""
+        stats = dict(cls._instance.batch_stats)
+        stats["texts_per_request"] = stats["texts"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+
+    @classmethod
+    def _get_spill_path(cls, cache_key: Hashable) -> Optional[str]:
+        """Return the file of the embedding on disk, or None if the disk cache is disabled."""
+        if not cls._instance.embedding_cache_dir:
+            return None
+
+        file_name = hashlib.sha256(repr(cache_key).encode()).hexdigest()
+        return os.path.join(cls._instance.embedding_cache_dir, f"{file_name}.npy")
+
+
+    @classmethod
+    def _enqueue(cls, cache_key: Hashable, query_str: str) -> asyncio.Future:
+        """
+        Queue the text for the next batch, and schedule the batch when the queue is full or the window ends.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        cls._instance.futures[cache_key] = future
+        cls._instance.queue[cache_key] = query_str
+
+        if len(cls._instance.queue) >= cls._instance.max_batch_size:
+            cls._flush()
+        elif cls._instance.flush_handle is None:
+            cls._instance.flush_handle = loop.call_later(cls._instance.batch_window, cls._flush)
+
+        return future
+
+
+    @classmethod
+    def _flush(cls) -> None:
+        """Send the queued texts as one request."""
+        if cls._instance.flush_handle is not None:
+            cls._instance.flush_handle.cancel()
+            cls._instance.flush_handle = None
+
+        batch = list(cls._instance.queue.items())
+        cls._instance.queue = {}
+        if not batch:
+            return
+
+        # Keep a reference, the event loop only holds weak ones to its tasks.
+        task = asyncio.get_running_loop().create_task(cls._send_batch(batch))
+        cls._instance.batch_tasks.add(task)
+        task.add_done_callback(cls._instance.batch_tasks.discard)
+
+
+    @classmethod
+    async def _send_batch(cls, batch: List[Tuple[Hashable, str]]) -> None:
+        """Embed the batch and resolve the futures of its texts."""
+        cls._instance.batch_stats["requests"] += 1
+        cls._instance.batch_stats["texts"] += len(batch)
+        futures = {cache_key: cls._instance.futures[cache_key] for cache_key, _ in batch}
+
+        error: BaseException = RuntimeError("The embedding batch was cancelled.")
+        try:
+            vectors = await cls._instance.ef.aencode_documents([query_str for _, query_str in batch])
+
+            for (cache_key, _), vector in zip(batch, vectors):
+                cls._instance.embedding_cache.set(cache_key, vector)
+                cls._instance.futures.pop(cache_key, None)
+                if not futures[cache_key].done():
+                    futures[cache_key].set_result(vector)
+
+                spill_path = cls._get_spill_path(cache_key)
+                if spill_path:
+                    # Off the event loop, and the disk cache is only a fallback.
+                    try:
+                        await asyncio.to_thread(np.save, spill_path, vector)
+                    except OSError as e:
+                        logging.getLogger('main').info(f"Failed to save a query embedding to {spill_path}: {e}")
+
+        except Exception as e:
+            logging.getLogger('main').info(f"Failed to embed a batch of {len(batch)} queries: {e}")
+            error = e
+
+        finally:
+            # Fail the unresolved futures, even if the task is cancelled, so no query waits forever.
+            for cache_key, future in futures.items():
+                if cls._instance.futures.get(cache_key) is future:
+                    del cls._instance.futures[cache_key]
+                if not future.done():
+                    future.set_exception(error)
@@ -0,0 +1,162 @@
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import Runnable
+from typing import List, Optional, Sequence, Tuple
+import threading
+import tiktoken
+import logging
+import json
+
+encoding = tiktoken.get_encoding('cl100k_base')
+
+
+class WindowedChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat history that only shows the latest turns to the prompt, within a token budget.
+
+    The turns out of the window are summarized, and the summary is shown before the
+    kept turns. The summary is saved in its own history and updated in the background,
+    so a request never waits for it: it may lag one turn behind the window.
+
+    Attributes:
+        history (BaseChatMessageHistory): The full chat history, where the new turns are saved.
+        summary_history (Optional[BaseChatMessageHistory]): History holding the summary of the older turns.
+        max_turns (Optional[int]): Number of latest turns shown, or None for all of them.
+        max_tokens (Optional[int]): Token budget of the shown turns, or None for no budget.
+        summarizer (Optional[Runnable]): Chain summarizing the older turns, or None to drop them.
+        key (str): Identifier of the history, so one summary update runs at a time.
+    """
+    # Histories whose summary is being updated.
+    _summarizing = set()
+    _summarizing_lock = threading.Lock()
+
+    # Tokens kept from each message of the turns sent to the summarizer.
+    SUMMARY_MESSAGE_TOKENS = 1000
+
+    def __init__(
+        self,
+        history: BaseChatMessageHistory,
+        summary_history: Optional[BaseChatMessageHistory] = None,
+        max_turns: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        summarizer: Optional[Runnable] = None,
+        key: str = ""
+    ):
+        """Wrap the chat history.
+
+        Args:
+            history (BaseChatMessageHistory): The full chat history, where the new turns are saved.
+            summary_history (Optional[BaseChatMessageHistory]): History holding the summary of the older turns.
+            max_turns (Optional[int]): Number of latest turns shown, or None for all of them.
+            max_tokens (Optional[int]): Token budget of the shown turns, or None for no budget.
+            summarizer (Optional[Runnable]): Chain summarizing the older turns, or None to drop them.
+            key (str): Identifier of the history, so one summary update runs at a time.
+        """
+        self.history = history
+        self.summary_history = summary_history
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.key = key
+
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """Return the summary of the older turns, then the latest turns within the budget."""
+        turns = _split_turns(self.history.messages)
+
+        kept = turns[-self.max_turns:] if self.max_turns else turns
+        if self.max_tokens is not None:
+            tokens = [sum(_count_tokens(message) for message in turn) for turn in kept]
+            while kept and sum(tokens) > self.max_tokens:
+                kept, tokens = kept[1:], tokens[1:]
+        dropped = len(turns) - len(kept)
+
+        messages = [message for turn in kept for message in turn]
+        if not dropped or self.summarizer is None or self.summary_history is None:
+            return messages
+
+        summary, covered = self._load_summary()
+        if covered < dropped:
+            self._update_summary(summary, covered, turns[covered:dropped], dropped)
+        # A summary of turns still in the window was made with another policy, don't repeat them.
+        if summary and covered <= dropped:
+            messages = [HumanMessage(content = f"Summary of the earlier conversation:\n{summary}")] + messages
+        return messages
+
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Save the messages in the full chat history."""
+        self.history.add_messages(messages)
+
+
+    def clear(self) -> None:
+        """Remove the chat history and its summary."""
+        self.history.clear()
+        if self.summary_history is not None:
+            self.summary_history.clear()
+
+
+    def _load_summary(self) -> Tuple[Optional[str], int]:
+        """Return the saved summary and the number of turns it covers."""
+        try:
+            saved = self.summary_history.messages
+        except Exception as e:
+            logging.getLogger('main').warning(f"Failed to load the history summary of {self.key}: {e}")
+            return None, 0
+
+        if not saved:
+            return None, 0
+        return saved[-1].content, saved[-1].additional_kwargs.get("turns", 0)
+
+
+    def _update_summary(self, summary: Optional[str], covered: int, turns: List[List[BaseMessage]], total: int) -> None:
+        """Summarize the turns into the previous summary in a background thread, and save the result."""
+        with self._summarizing_lock:
+            if self.key in self._summarizing:
+                return
+            self._summarizing.add(self.key)
+
+        def run():
+            try:
+                conversation = "\n\n".join(
+                    f"{message.type}: {_truncate(message, self.SUMMARY_MESSAGE_TOKENS)}"
+                    for turn in turns for message in turn
+                )
+                result = self.summarizer.invoke({"summary": summary or "", "conversation": conversation})
+                self.summary_history.clear()
+                self.summary_history.add_message(AIMessage(content = result.content, additional_kwargs = {"turns": total}))
+                logging.getLogger('main').info(f"History summary of {self.key} updated, {total} turns covered")
+            except Exception as e:
+                logging.getLogger('main').warning(f"Failed to update the history summary of {self.key}: {e}")
+            finally:
+                with self._summarizing_lock:
+                    self._summarizing.discard(self.key)
+
+        threading.Thread(target = run, name = f"history-summary-{self.key}", daemon = True).start()
+
+
+
+def _split_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group the messages in turns, each starting with a user message."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _get_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content)
+
+
+def _count_tokens(message: BaseMessage) -> int:
+    return len(encoding.encode(_get_text(message)))
+
+
+def _truncate(message: BaseMessage, max_tokens: int) -> str:
+    tokens = encoding.encode(_get_text(message))
+    if len(tokens) <= max_tokens:
+        return _get_text(message)
+    return encoding.decode(tokens[:max_tokens]) + " [...]"
@@ -0,0 +1,186 @@
+from typing import Any, Dict, List, Optional
+import numpy as np
+import threading
+import logging
+import json
+import os
+
+
+class LocalVectorStore:
+    """
+    In-process copy of a vector collection, for exact cosine search over small candidate sets.
+
+    The vectors are kept in a memory-mapped float32 matrix, with the metadata of every row
+    and an index from deal_id to its rows. The store is reloaded when its files are replaced.
+
+    Attributes:
+        directory (str): Directory holding vectors.npy and metadata.json.
+        max_candidates (int): Largest candidate set searched locally.
+    """
+    VECTORS_FILE = "vectors.npy"
+    METADATA_FILE = "metadata.json"
+
+    def __init__(self, directory: str, max_candidates: int = 1000):
+        """Initialize an empty store, call load() to read it from the directory.
+
+        Args:
+            directory (str): Directory holding vectors.npy and metadata.json.
+            max_candidates (int): Largest candidate set searched locally.
+        """
+        self.directory = directory
+        self.max_candidates = max_candidates
+        self.vectors: Optional[np.ndarray] = None
+        self.rows: List[Dict[str, Any]] = []
+        self.deal_rows: Dict[Any, List[int]] = {}
+        self.known_deal_ids: set = set()
+        self._loaded_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+
+    @classmethod
+    def save(
+        cls,
+        directory: str,
+        entities: List[Dict[str, Any]],
+        vector_field: str = "vector",
+        known_deal_ids: Optional[List] = None
+    ) -> None:
+        """
+        Write the entities to the directory, replacing the previous store.
+
+        The files are written aside and renamed into place, metadata last, so a reader
+        never sees a half written store.
+
+        Args:
+            directory (str): Directory of the store.
+            entities (List[Dict[str, Any]]): Entities with the vector field and their metadata fields.
+            vector_field (str): Name of the vector field.
+            known_deal_ids (Optional[List]): Every deal of the indexed data, including the deals without vectors.
+        """
+        os.makedirs(directory, exist_ok = True)
+        dimensions = len(entities[0][vector_field]) if entities else 0
+
+        vectors_path = os.path.join(directory, cls.VECTORS_FILE)
+        vectors = np.lib.format.open_memmap(f"{vectors_path}.tmp", mode = "w+", dtype = np.float32, shape = (len(entities), dimensions))
+        for i, entity in enumerate(entities):
+            vectors[i] = entity[vector_field]
+        # Normalize once, so the search is a plain dot product.
+        if len(entities):
+            norms = np.linalg.norm(vectors, axis = 1, keepdims = True)
+            vectors /= np.where(norms == 0, 1, norms)
+        vectors.flush()
+        del vectors
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+
+        metadata_path = os.path.join(directory, cls.METADATA_FILE)
+        rows = [{key: value for key, value in entity.items() if key != vector_field} for entity in entities]
+        with open(f"{metadata_path}.tmp", "w") as f:
+            json.dump({"num_rows": len(rows), "dimensions": dimensions, "rows": rows, "known_deal_ids": list(known_deal_ids or [])}, f)
+        os.replace(f"{metadata_path}.tmp", metadata_path)
+
+
+    def load(self) -> bool:
+        """
+        Load the store if its files changed since the last load.
+
+        Returns:
+            bool: True if the store is loaded.
+        """
+        metadata_path = os.path.join(self.directory, self.METADATA_FILE)
+        try:
+            mtime = os.path.getmtime(metadata_path)
+        except OSError:
+            return self.vectors is not None
+
+        if mtime == self._loaded_mtime:
+            return True
+
+        with self._lock:
+            if mtime == self._loaded_mtime:
+                return True
+            try:
+                with open(metadata_path) as f:
+                    metadata = json.load(f)
+                vectors = np.load(os.path.join(self.directory, self.VECTORS_FILE), mmap_mode = "r")
+                if vectors.shape[0] != metadata["num_rows"]:
+                    # The vectors were replaced after the metadata was read, retry on the next search.
+                    raise ValueError(f"{vectors.shape[0]} vectors for {metadata['num_rows']} rows")
+            except Exception as e:
+                logging.getLogger('main').warning(f"Failed to load the local vector store at {self.directory}: {e}")
+                return self.vectors is not None
+
+            deal_rows = {}
+            for i, row in enumerate(metadata["rows"]):
+                deal_rows.setdefault(row["deal_id"], []).append(i)
+
+            self.vectors, self.rows, self.deal_rows = vectors, metadata["rows"], deal_rows
+            self.known_deal_ids = set(metadata.get("known_deal_ids", []))
+            self._loaded_mtime = mtime
+            logging.getLogger('main').info(f"Loaded the local vector store, {len(self.rows)} vectors.")
+            return True
+
+
+    def can_search(self, filter_deals: Optional[List], output_fields: List[str], dimensions: int) -> bool:
+        """
+        Check that the search can run locally: a small filtered candidate set whose deals
+        are all in the store, fields the store has, and matching dimensions.
+        """
+        if not filter_deals or len(filter_deals) > self.max_candidates or not self.load():
+            return False
+        if self.vectors.shape[1] != dimensions:
+            return False
+        if self.rows and any(field not in self.rows[0] for field in output_fields):
+            return False
+        # A deal indexed without vectors (no description) has no hits either way,
+        # but an unknown deal may be newer than the store, let Milvus answer.
+        return all(deal_id in self.deal_rows or deal_id in self.known_deal_ids for deal_id in filter_deals)
+
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        filter_deals: List,
+        output_fields: List[str],
+        limit: int = 100,
+        group_by_field: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank the rows of the candidate deals by cosine similarity to the query.
+
+        Args:
+            query_vector (np.ndarray): Query embedding.
+            filter_deals (List): Candidate deal ids.
+            output_fields (List[str]): Metadata fields returned with each hit.
+            limit (int): Maximum number of hits.
+            group_by_field (Optional[str]): If set, keep only the best row of each value of the field, as Milvus does.
+
+        Returns:
+            List[Dict[str, Any]]: Hits shaped like Milvus search results, best first.
+        """
+        vectors, rows, deal_rows = self.vectors, self.rows, self.deal_rows
+        candidate_rows = np.array(sorted({i for deal_id in filter_deals for i in deal_rows.get(deal_id, [])}), dtype = np.int64)
+        if not len(candidate_rows):
+            return []
+
+        query = np.asarray(query_vector, dtype = np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        scores = vectors[candidate_rows] @ query
+
+        top = np.argsort(-scores, kind = "stable")
+        if group_by_field:
+            best_of_group, seen = [], set()
+            for i in top:
+                group = rows[candidate_rows[i]][group_by_field]
+                if group not in seen:
+                    seen.add(group)
+                    best_of_group.append(i)
+            top = best_of_group
+        top = top[:limit]
+        return [
+            {
+                "id": rows[candidate_rows[i]].get("id"),
+                "distance": float(scores[i]),
+                "entity": {field: rows[candidate_rows[i]][field] for field in output_fields}
+            }
+            for i in top
+        ]
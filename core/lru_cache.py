@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import threading
+import time
+
+
+class LRUCache:
+    """
+    Bounded in-process cache with least-recently-used eviction and an optional time-to-live.
+
+    Attributes:
+        max_size (int): Maximum number of entries kept in the cache.
+        ttl (Optional[float]): Seconds an entry stays valid, or None to keep it until it is evicted.
+    """
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = None):
+        """Initialize an empty cache.
+
+        Args:
+            max_size (int): Maximum number of entries kept in the cache.
+            ttl (Optional[float]): Seconds an entry stays valid, or None to keep it until it is evicted.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for the key, or default if it is missing or expired."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            value, stored_at = item
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._items[key]
+                self.misses += 1
+                return default
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store the value, evicting the least recently used entries when the cache is full."""
+        with self._lock:
+            self._items[key] = (value, time.monotonic())
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.max_size:
+                self._items.popitem(last = False)
+                self.evictions += 1
+
+
+    def pop(self, key: Hashable) -> None:
+        """Remove the entry for the key if it exists."""
+        with self._lock:
+            self._items.pop(key, None)
+
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._items.clear()
+
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit, miss and eviction counters."""
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -52,9 +52,12 @@
 from typing import Optional
 from config import Credentials
 from typing import Dict, Any, List
-from pymilvus import MilvusClient
-from kg_population.vector_calculator.vector_schmea import vector_schema
-from kg_population.vector_calculator.embedding_function import JinaEmbeddingFunction
+from pymilvus import MilvusClient, AnnSearchRequest, Function, RRFRanker, WeightedRanker
+from kg_population.vector_calculator.vector_schmea import vector_schema, encode_vector, encode_query_vector, decode_vector
+from core.embedding_provider import RocloEmbeddingProvider
+from core.local_vector_store import LocalVectorStore
+import numpy as np
+import asyncio
 import logging
 
 class RocloMilvusVectorDB:
@@ -71,12 +74,27 @@ class RocloMilvusVectorDB:
         if cls._instance is None:
             cls._instance = super(RocloMilvusVectorDB, cls).__new__(cls)
             cls._instance.client = None
+            cls._instance.local_store = None
         return cls._instance
     
 
     @classmethod
-    def connect(cls):
-        """Initialize the connection to the Neo4j GraphDB."""
+    def connect(
+        cls,
+        embedding_cache_size: int = 1024,
+        embedding_cache_ttl: Optional[float] = 3600,
+        embedding_cache_dir: Optional[str] = None,
+        use_local_store: bool = False
+    ):
+        """
+        Initialize the connection to the Neo4j GraphDB.
+
+        Args:
+            embedding_cache_size (int): Number of query embeddings kept in memory, if the embedding provider isn't connected yet.
+            embedding_cache_ttl (Optional[float]): Seconds a query embedding stays in memory, or None to keep it until it is evicted.
+            embedding_cache_dir (Optional[str]): Directory where query embeddings are also saved, so they survive restarts and evictions.
+            use_local_store (bool): If True, rerank small candidate sets with the local vector store exported by index_vector.
+        """
         if cls._instance is None:
             cls()
 
@@ -84,13 +102,16 @@ class RocloMilvusVectorDB:
             cls._instance.client = MilvusClient(
                 uri = Credentials.get_secret("MILVUS_URI")
             )
-            # Define the Jina embedding function.
-            cls._instance.ef = JinaEmbeddingFunction(
-                vector_schema['values']['model'],
-                Credentials.get_secret("JINAAI_API_KEY"),
-                task = vector_schema['values']['task'],
-                dimensions = vector_schema['values']['dimensions']
-            )
+            # The query embeddings are shared with the other vector search backends.
+            if not RocloEmbeddingProvider.is_connected():
+                RocloEmbeddingProvider.connect(embedding_cache_size, embedding_cache_ttl, embedding_cache_dir)
+
+            if use_local_store:
+                local_store = vector_schema['local_store']
+                cls._instance.local_store = LocalVectorStore(local_store['dir'], local_store['max_candidates'])
+                if not cls._instance.local_store.load():
+                    logging.getLogger('main').info(f"No local vector store at {local_store['dir']} yet, searching Milvus.")
+
             collection_name = vector_schema['collection_name']
             if cls._instance.client.has_collection(collection_name):
                 RocloMilvusVectorDB.load_collection(collection_name)
@@ -103,15 +124,20 @@ class RocloMilvusVectorDB:
             
     
     @classmethod
-    def create_collection(cls, collection: Dict[str, Any]) -> None:
+    def create_collection(cls, collection: Dict[str, Any], drop_existing: bool = True) -> None:
         """
         Create the collection.
 
         Args:
             collection_name (str): Name of the collection.
+            drop_existing (bool): If False, keep the collection when it already exists.
         """
         collection_name = collection['collection_name']
 
+        if not drop_existing and cls._instance.client.has_collection(collection_name):
+            logging.getLogger('main').info(f"Kept existing collection: {collection_name}")
+            return
+
         if cls._instance.client.has_collection(collection_name):
             cls._instance.client.drop_collection(collection_name=collection_name)
             logging.getLogger('main').info(f"Dropped existing collection: {collection_name}")
@@ -149,6 +175,8 @@ class RocloMilvusVectorDB:
         )
         for field in schema['schema']:
             milvus_schema.add_field(**field)
+        for function in schema.get('functions', []):
+            milvus_schema.add_function(Function(**function))
 
         return milvus_schema
 
@@ -180,6 +208,85 @@ class RocloMilvusVectorDB:
         )
 
     
+    @classmethod
+    def delete_data(cls, collection_name: str, filter: str) -> None:
+        """
+        Delete the entities matching the filter.
+
+        Args:
+            collection_name (str): Name of the collection
+            filter (str): Boolean expression selecting the entities to delete.
+        """
+        cls._instance.client.delete(
+            collection_name = collection_name,
+            filter = filter
+        )
+
+
+    @classmethod
+    def has_field(cls, collection_name: str, field_name: str) -> bool:
+        """Check that the collection exists and has the field."""
+        return cls.get_field(collection_name, field_name) is not None
+
+
+    @classmethod
+    def get_field(cls, collection_name: str, field_name: str) -> Optional[Dict[str, Any]]:
+        """Return the description of the field, or None if the collection or the field doesn't exist."""
+        if not cls._instance.client.has_collection(collection_name):
+            return None
+
+        fields = cls._instance.client.describe_collection(collection_name)['fields']
+        return next((field for field in fields if field['name'] == field_name), None)
+
+
+    @classmethod
+    def query_all(cls, collection_name: str, output_fields: List[str], batch_size: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Read the given fields of every entity in the collection.
+
+        Args:
+            collection_name (str): Name of the collection
+            output_fields (List[str]): Fields to return.
+            batch_size (int): Number of entities read per request.
+        """
+        iterator = cls._instance.client.query_iterator(
+            collection_name = collection_name,
+            batch_size = batch_size,
+            filter = "",
+            output_fields = output_fields
+        )
+
+        entities = []
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                entities.extend(batch)
+        finally:
+            iterator.close()
+
+        return entities
+
+    
+    @classmethod
+    def export_local_store(cls, collection_name: str, known_deal_ids: Optional[List] = None) -> None:
+        """
+        Export the vectors of the collection to the local vector store, replacing the previous export.
+
+        Args:
+            collection_name (str): Name of the collection.
+            known_deal_ids (Optional[List]): Every indexed deal, so the deals without description count as covered.
+        """
+        local_store = vector_schema['local_store']
+        entities = cls.query_all(collection_name, local_store['fields'] + ["vector"])
+        # The store keeps float32 vectors, whatever the vector storage type.
+        for entity in entities:
+            entity["vector"] = decode_vector(entity["vector"], vector_schema['values']['vector_type'])
+        LocalVectorStore.save(local_store['dir'], entities, known_deal_ids = known_deal_ids)
+        logging.getLogger('main').info(f"Exported {len(entities)} vectors of {collection_name} to {local_store['dir']}.")
+
+    
     @classmethod
     def release_collection(cls, collection_name: str) -> None:
         """Release the collection"""
@@ -195,23 +302,46 @@ class RocloMilvusVectorDB:
         )
 
     @classmethod
-    def search_data(cls, query_str:str, collection_name: str, filter_deals: List, selction_list: List = ["id", "deal_id", "text", "title"], distance_threshold: float = 0) -> List:
-        """Similarity Search"""
+    async def search_data(cls, query_str:str, collection_name: str, filter_deals: List, selction_list: List = ["id", "deal_id", "text", "title"], distance_threshold: float = 0, search_params: Optional[Dict[str, Any]] = None, group_by_field: Optional[str] = None) -> List:
+        """
+        Similarity Search
+
+        Descriptions are stored as passages, with group_by_field="deal_id" each deal is scored by its most similar passage.
+        The hits are grouped here rather than by Milvus, whose grouping search needs a newer server.
+        """
         # embedding
-        query_vector = cls._instance.ef.encode_documents([query_str])
+        query_vector = [await cls._embed_query(query_str)]
 
-        # search
-        results = cls._instance.client.search(
-            collection_name=collection_name,
-            data=query_vector,
-            limit=100,
-            filter=f"deal_id in {filter_deals}",
-            # search_params={
-            #     "metric_type": "COSINE",
-            #     "params": {"ef": 64}  # or other params depending on index type
-            # },
-            output_fields=selction_list
-        )[0]
+        local_store = cls._instance.local_store
+        if local_store and collection_name == vector_schema['collection_name'] and local_store.can_search(filter_deals, selction_list, len(query_vector[0])):
+            # rerank the candidates in process, one matmul
+            # The query is quantized like the stored vectors, as Milvus does. For BINARY vectors, the cosine
+            # of the -1/+1 vectors is the 1 - 2 * hamming / dimensions similarity of the Milvus path.
+            vector_type = vector_schema['values']['vector_type']
+            local_query = decode_vector(encode_vector(query_vector[0], vector_type), vector_type)
+            results = local_store.search(local_query, filter_deals, selction_list, limit=100, group_by_field=group_by_field)
+        else:
+            # search, off the event loop
+            results = (await asyncio.to_thread(
+                cls._instance.client.search,
+                collection_name=collection_name,
+                data=[encode_query_vector(query_vector[0], vector_schema['values']['vector_type'])],
+                # Fetch extra hits, passages of the same deal are merged below.
+                limit=500 if group_by_field else 100,
+                filter=f"deal_id in {filter_deals}",
+                # The params of the collection's index type, see vector_index_presets.
+                search_params=search_params or vector_schema['search_params'],
+                output_fields=list(dict.fromkeys(selction_list + ([group_by_field] if group_by_field else [])))
+            ))[0]
+
+            if group_by_field:
+                # The best hit of each group, i.e. max-sim over the passages of a deal.
+                results = cls._best_of_group(results, group_by_field)[:100]
+
+            if (search_params or vector_schema['search_params'])['metric_type'] == "HAMMING":
+                # Turn the Hamming distance into the cosine similarity of the -1/+1 vectors, so thresholds keep their meaning.
+                dimensions = vector_schema['values']['dimensions']
+                results = [{**hit, "distance": 1 - 2 * hit['distance'] / dimensions} for hit in results]
 
         print(results)
 
@@ -222,4 +352,95 @@ class RocloMilvusVectorDB:
             if len(filtered_results) > 3:
                 results = filtered_results
         
-        return results
\ No newline at end of file
+        return results
+
+
+    @classmethod
+    async def hybrid_search(
+        cls,
+        query_str: str,
+        collection_name: str,
+        filter_deals: List,
+        selction_list: List = ["id", "deal_id", "text", "title"],
+        keyword_query_str: Optional[str] = None,
+        ranker: Optional[str] = None,
+        limit: int = 100,
+        group_by_field: Optional[str] = "deal_id"
+    ) -> List:
+        """
+        Search the dense vectors and the BM25 sparse vectors in one call, and fuse the two rankings.
+
+        Args:
+            query_str (str): Text embedded for the dense search.
+            collection_name (str): Name of the collection.
+            filter_deals (List): Candidate deal ids.
+            selction_list (List): Fields returned with each hit.
+            keyword_query_str (Optional[str]): Text matched by BM25, e.g. the user question with its company names. Defaults to query_str.
+            ranker (Optional[str]): "rrf" or "weighted", defaults to vector_schema['hybrid']['ranker'].
+            limit (int): Maximum number of hits.
+            group_by_field (Optional[str]): If set, keep only the best hit of each value of the field.
+
+        Returns:
+            List: Hits ordered by fused score. The scores are fusion scores, not similarities.
+                Without a sparse field, the hits of search_data.
+        """
+        if not await asyncio.to_thread(cls.has_field, collection_name, "sparse"):
+            # Collections indexed before the BM25 field only have the dense vectors.
+            logging.getLogger('main').info(f"{collection_name} has no sparse vectors, searching the dense vectors only.")
+            return await cls.search_data(query_str, collection_name, filter_deals, selction_list, group_by_field=group_by_field)
+
+        hybrid = vector_schema['hybrid']
+        ranker = ranker or hybrid['ranker']
+        query_vector = await cls._embed_query(query_str)
+        filter = f"deal_id in {filter_deals}" if filter_deals else ""
+
+        # Fetch extra hits, passages of the same deal are merged below.
+        request_limit = limit * 5 if group_by_field else limit
+        requests = [
+            AnnSearchRequest(
+                data=[encode_query_vector(query_vector, vector_schema['values']['vector_type'])],
+                anns_field="vector",
+                param=vector_schema['search_params'],
+                limit=request_limit,
+                expr=filter
+            ),
+            AnnSearchRequest(
+                data=[keyword_query_str or query_str],
+                anns_field="sparse",
+                param=hybrid['sparse_search_params'],
+                limit=request_limit,
+                expr=filter
+            )
+        ]
+
+        results = (await asyncio.to_thread(
+            cls._instance.client.hybrid_search,
+            collection_name=collection_name,
+            reqs=requests,
+            ranker=RRFRanker(hybrid['rrf_k']) if ranker == "rrf" else WeightedRanker(*hybrid['weights']),
+            limit=request_limit,
+            output_fields=list(dict.fromkeys(selction_list + ([group_by_field] if group_by_field else [])))
+        ))[0]
+
+        if group_by_field:
+            results = cls._best_of_group(results, group_by_field)
+
+        return results[:limit]
+
+
+    @staticmethod
+    def _best_of_group(hits: List, group_by_field: str) -> List:
+        """Keep the first, i.e. best, hit of each value of the field."""
+        best_of_group, seen = [], set()
+        for hit in hits:
+            group = hit['entity'][group_by_field]
+            if group not in seen:
+                seen.add(group)
+                best_of_group.append(hit)
+        return best_of_group
+
+
+    @classmethod
+    async def _embed_query(cls, query_str: str) -> np.ndarray:
+        """Embed the query with the shared embedding provider."""
+        return await RocloEmbeddingProvider.embed_query(query_str)
@@ -57,7 +57,10 @@
 from typing import Optional
 import opik
 import logging
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List
+import threading
+import json
+import os
 import re
 
 
@@ -78,32 +81,74 @@ class RocloOpikTracker:
         if cls._instance is None:
             cls._instance = super(RocloOpikTracker, cls).__new__(cls)
             cls._instance.client = None
+            cls._instance.prompt_cache_dir = "./prompt_cache"
+            cls._instance.prompts = {}
+            cls._instance.prompt_lock = threading.Lock()
+            cls._instance.prompt_callbacks = []
+            cls._instance.refresh_thread = None
+            cls._instance.refresh_stop = threading.Event()
         return cls._instance
 
 
     
     @classmethod
-    def configure(cls, project_name: str) -> None:
-        """Load secrets from AWS Secrets Manager and store them in the instance."""
+    def configure(
+        cls,
+        project_name: str,
+        prompt_cache_dir: str = "./prompt_cache",
+        prompt_refresh_interval: Optional[float] = 300
+    ) -> None:
+        """Create the Opik client, and start refreshing the cached prompts in the background.
+
+        Args:
+            project_name (str): Name of the Opik project.
+            prompt_cache_dir (str): Directory of the prompt cache.
+            prompt_refresh_interval (Optional[float]): Seconds between two checks of the prompt versions, or None to never check.
+        """
         if cls._instance is None:
             cls()
         cls._instance.client = opik.Opik(project_name = project_name)
+        cls._instance.prompt_cache_dir = prompt_cache_dir
         logging.getLogger('main').info("Comet Opik configured successfully")
 
+        if prompt_refresh_interval and cls._instance.refresh_thread is None:
+            cls._instance.refresh_thread = threading.Thread(
+                target = cls._refresh_prompts_loop,
+                args = (prompt_refresh_interval,),
+                name = "opik-prompt-refresh",
+                daemon = True
+            )
+            cls._instance.refresh_thread.start()
+
 
 
     @classmethod
     def get_prompt(cls, name: str, is_template: bool = False) -> Optional[str]:
-        """Retrieve a specific secret value by key.  
+        """Retrieve a prompt, from memory, the prompt cache on disk, or Opik.
+
+        The cached version is returned even if a newer one exists, the background refresh
+        loads the new versions and notifies the callbacks of on_prompt_update().
 
         Args:  
-            key (str): The key of the secret to retrieve.  
+            name (str): The name of the prompt.
 
         Returns:  
-            Optional[str]: The value of the secret if found, otherwise None.  
+            Optional[str]: The text of the prompt.
         """
+        if cls._instance is None:
+            cls()
+
         try:
-            return cls._instance.client.get_prompt(name = name).prompt
+            with cls._instance.prompt_lock:
+                cached = cls._instance.prompts.get(name)
+            if cached is None:
+                cached = cls._load_cached_prompt(name)
+            if cached is None:
+                cached = cls._fetch_prompt(name)
+
+            with cls._instance.prompt_lock:
+                cls._instance.prompts.setdefault(name, cached)
+            return cached['prompt']
             # if not is_template:
             #     return cls._instance.client.get_prompt(name = name).prompt
             # else:
@@ -116,6 +161,111 @@ class RocloOpikTracker:
             logging.getLogger('main').info(f"Error while getting prompt '{name}': {e}")  
             raise
 
+
+
+    @classmethod
+    def on_prompt_update(cls, callback: Callable[[List[str]], None]) -> None:
+        """Register a callback called with the names of the prompts when new versions are loaded.
+
+        Args:
+            callback (Callable[[List[str]], None]): Function called from the refresh thread.
+        """
+        if cls._instance is None:
+            cls()
+        cls._instance.prompt_callbacks.append(callback)
+
+
+
+    @classmethod
+    def refresh_prompts(cls) -> List[str]:
+        """Check the commit of every used prompt on Opik, and load the new versions.
+
+        Returns:
+            List[str]: The names of the updated prompts.
+        """
+        with cls._instance.prompt_lock:
+            cached_prompts = dict(cls._instance.prompts)
+
+        updated = []
+        for name, cached in cached_prompts.items():
+            try:
+                latest = cls._fetch_prompt(name)
+            except Exception:
+                # Opik is unreachable, keep the cached version and try again later.
+                continue
+            if latest['commit'] != cached['commit']:
+                with cls._instance.prompt_lock:
+                    cls._instance.prompts[name] = latest
+                updated.append(name)
+                logging.getLogger('main').info(f"Prompt '{name}' updated to commit {latest['commit']}")
+
+        if updated:
+            for callback in cls._instance.prompt_callbacks:
+                try:
+                    callback(updated)
+                except Exception as e:
+                    logging.getLogger('main').error(f"Error while applying the updated prompts {updated}: {e}")
+        return updated
+
+
+
+    @classmethod
+    def _refresh_prompts_loop(cls, interval: float) -> None:
+        """Refresh the prompts every interval, until the process exits."""
+        while True:
+            if cls._instance.client is not None:
+                cls.refresh_prompts()
+            if cls._instance.refresh_stop.wait(interval):
+                return
+
+
+
+    @classmethod
+    def _fetch_prompt(cls, name: str) -> Dict[str, Any]:
+        """Fetch the latest version of the prompt from Opik, and save it in the prompt cache."""
+        if cls._instance.client is None:
+            raise RuntimeError(f"Prompt '{name}' is not cached and Opik is not configured")
+
+        prompt = cls._instance.client.get_prompt(name = name)
+        if prompt is None:
+            raise ValueError(f"Prompt '{name}' not found")
+
+        cached = {"name": name, "commit": prompt.commit, "prompt": prompt.prompt}
+        cls._save_cached_prompt(cached)
+        return cached
+
+
+
+    @classmethod
+    def _get_cache_path(cls, name: str) -> str:
+        """Return the file of the prompt in the prompt cache."""
+        return os.path.join(cls._instance.prompt_cache_dir, f"{name}.json")
+
+
+
+    @classmethod
+    def _load_cached_prompt(cls, name: str) -> Optional[Dict[str, Any]]:
+        """Read the prompt from the prompt cache, or None if it is not cached."""
+        try:
+            with open(cls._get_cache_path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+
+    @classmethod
+    def _save_cached_prompt(cls, cached: Dict[str, Any]) -> None:
+        """Write the prompt to the prompt cache, aside then renamed so readers never see a partial file."""
+        try:
+            os.makedirs(cls._instance.prompt_cache_dir, exist_ok = True)
+            path = cls._get_cache_path(cached['name'])
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(cached, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logging.getLogger('main').warning(f"Failed to cache the prompt '{cached['name']}': {e}")
+
     
     @classmethod
     def add_item_to_dataset(cls, item: Dict[str, Any], dataset_name: str) -> None:
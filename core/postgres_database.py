@@ -56,11 +56,20 @@
 # Feature: Add result augmenter capabilities
 # Refactor: Optimize memory usage patterns
 import psycopg
+from psycopg_pool import AsyncConnectionPool
+from sqlglot import parse_one, exp
+from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
 from config import Credentials
-from typing import Optional, Dict, Any
+from core.lru_cache import LRUCache
+from typing import Optional, Dict, Any, List, Sequence, Tuple, Hashable
+import asyncio
 import logging
+import time
 from tqdm import tqdm
 
+# Table holding a version counter per data table, bumped by every write that changes the data.
+DATA_VERSION_TABLE = "roclo_data_version"
+
 class RocloPostgresDatabase:
     """
     Singleton class to manage Roclo Postgres database.
@@ -73,23 +82,77 @@ class RocloPostgresDatabase:
             cls._instance = super(RocloPostgresDatabase, cls).__new__(cls)
             cls._instance.connection = None
             cls._instance.cursor = None
+            cls._instance.pool = None
+            cls._instance.pool_lock = None
+            cls._instance.pool_metrics = None
+            cls._instance.result_cache = None
+            cls._instance.data_version = None
+            cls._instance.data_version_checked_at = 0.0
+            cls._instance.data_version_check_interval = 0.0
         return cls._instance
     
     @classmethod
-    def connect(cls):
-        """Initialize the connection to the Postgres."""
+    def connect(
+        cls,
+        use_pool: bool = False,
+        pool_min_size: int = 1,
+        pool_max_size: int = 10,
+        pool_timeout: float = 30.0,
+        result_cache_size: int = 0,
+        result_cache_ttl: Optional[float] = None,
+        data_version_check_interval: float = 5.0
+    ):
+        """
+        Initialize the connection to the Postgres.
+
+        Args:
+            use_pool (bool): If True, create an async connection pool and serve every query on its own connection.
+                Otherwise open a single sync connection (used by the construction and monitoring scripts).
+            pool_min_size (int): Minimum number of connections kept open by the pool.
+            pool_max_size (int): Maximum number of connections the pool can open.
+            pool_timeout (float): Seconds to wait for a free connection before failing.
+            result_cache_size (int): Number of query results kept in the result cache, 0 disables it.
+            result_cache_ttl (Optional[float]): Seconds a cached result stays valid, or None to keep it until the data changes.
+            data_version_check_interval (float): Seconds between two reads of the data version by the result cache.
+        """
         if cls._instance is None:
             cls()
+
+        connection_kwargs = {
+            "dbname": Credentials.get_secret("POSTGRES_DBNAME"),
+            "user": Credentials.get_secret("POSTGRES_USER"),
+            "password": Credentials.get_secret("POSTGRES_PASSWORD"),
+            "host": Credentials.get_secret("POSTGRES_HOST")
+        }
         
         try:
-            cls._instance.connection = psycopg.connect(
-                dbname=Credentials.get_secret("POSTGRES_DBNAME"),
-                user=Credentials.get_secret("POSTGRES_USER"),
-                password=Credentials.get_secret("POSTGRES_PASSWORD"),
-                host=Credentials.get_secret("POSTGRES_HOST")
-            )
-            cls._instance.cursor = cls._instance.connection.cursor()
-            logging.getLogger('main').info("Postgres Database connected.")
+            if use_pool:
+                # The pool is opened lazily, on the first query, because it needs a running event loop.
+                cls._instance.pool = AsyncConnectionPool(
+                    kwargs = connection_kwargs,
+                    min_size = pool_min_size,
+                    max_size = pool_max_size,
+                    timeout = pool_timeout,
+                    open = False
+                )
+                cls._instance.pool_lock = asyncio.Lock()
+                cls._instance.pool_metrics = {
+                    "acquisitions": 0,
+                    "total_wait_seconds": 0.0,
+                    "max_wait_seconds": 0.0
+                }
+                logging.getLogger('main').info(
+                    "Postgres connection pool configured (min_size=%s, max_size=%s).", pool_min_size, pool_max_size
+                )
+            else:
+                cls._instance.connection = psycopg.connect(**connection_kwargs)
+                cls._instance.cursor = cls._instance.connection.cursor()
+                logging.getLogger('main').info("Postgres Database connected.")
+
+            if result_cache_size:
+                cls._instance.result_cache = LRUCache(max_size = result_cache_size, ttl = result_cache_ttl)
+                cls._instance.data_version_check_interval = data_version_check_interval
+                logging.getLogger('main').info("Postgres result cache enabled (size=%s, ttl=%s).", result_cache_size, result_cache_ttl)
         except Exception as e:
             logging.getLogger('main').info("Failed to connect to Postgres database: %s", e)
             raise
@@ -100,6 +163,50 @@ class RocloPostgresDatabase:
         if cls._instance.connection:
             cls._instance.connection.close()
 
+    @classmethod
+    async def close_pool(cls):
+        """Close the Postgres connection pool"""
+        if cls._instance.pool is not None and not cls._instance.pool.closed:
+            await cls._instance.pool.close()
+            logging.getLogger('main').info("Postgres connection pool closed.")
+
+    @classmethod
+    async def _get_pool(cls) -> AsyncConnectionPool:
+        """Return the connection pool, opening it on first use."""
+        pool = cls._instance.pool
+        if pool.closed:
+            async with cls._instance.pool_lock:
+                if pool.closed:
+                    await pool.open()
+                    logging.getLogger('main').info("Postgres connection pool opened.")
+        return pool
+
+    @classmethod
+    def _record_pool_wait(cls, wait_seconds: float) -> None:
+        """Record how long a request waited to acquire a pooled connection."""
+        metrics = cls._instance.pool_metrics
+        metrics["acquisitions"] += 1
+        metrics["total_wait_seconds"] += wait_seconds
+        metrics["max_wait_seconds"] = max(metrics["max_wait_seconds"], wait_seconds)
+
+        if wait_seconds > 1:
+            logging.getLogger('main').info("Waited %.3fs for a pooled Postgres connection.", wait_seconds)
+
+    @classmethod
+    def get_pool_metrics(cls) -> Dict[str, Any]:
+        """
+        Return the connection acquisition metrics together with the pool statistics.
+        """
+        if cls._instance.pool is None:
+            return {}
+
+        metrics = dict(cls._instance.pool_metrics)
+        metrics["avg_wait_seconds"] = (
+            metrics["total_wait_seconds"] / metrics["acquisitions"] if metrics["acquisitions"] else 0.0
+        )
+        metrics["pool"] = cls._instance.pool.get_stats()
+        return metrics
+
     @classmethod
     def _create_table(cls, table_schema: Dict[str, Any]) -> None:
         """
@@ -117,11 +224,18 @@ class RocloPostgresDatabase:
         cls._instance.cursor.execute(table_schema['index_sql'])
         logging.getLogger('main').info(f"Index {table_schema['table_name']} created.")
 
+        # The synced hashes describe the dropped rows, forget them.
+        if table_schema.get('sync_state_table'):
+            cls._reset_content_hashes(table_schema)
+
     @classmethod
-    def _insert_data(cls, table_schema: Dict[str, Any], data):
+    def _insert_data(cls, table_schema: Dict[str, Any], data) -> int:
         """
         Insert data in batches of 20 with upsert (on conflict do update).
         Ensures no duplicate conflict keys in the same batch.
+
+        Returns:
+            int: Number of upserted rows.
         """
 
         def chunked(iterable, chunk_size):
@@ -129,13 +243,14 @@ class RocloPostgresDatabase:
                 yield iterable[i:i + chunk_size]
 
         if not data:
-            return
+            return 0
 
         columns = list(data[0].keys())
         col_names = ", ".join(columns)
         row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
         update_clause = ", ".join([f"{col}=EXCLUDED.{col}" for col in columns if col != 'deal_id'])
 
+        upserted = 0
         for chunk in tqdm(chunked(data, 20), total=(len(data) + 19) // 20, desc="Inserting"):
             # Deduplicate chunk by 'deal_id'
             seen_ids = set()
@@ -161,21 +276,288 @@ class RocloPostgresDatabase:
 
             try:
                 cls._instance.cursor.execute(sql, values_flat)
+                upserted += len(deduped_chunk)
             except Exception as e:
                 logging.getLogger('main').info(f"Exception Occurred while execuintg inserting query: {e}")
 
         cls._instance.connection.commit()
+
+        return upserted
     
     @classmethod
-    async def execute_query(cls, query: str) -> Dict:
+    def _delete_data(cls, table_schema: Dict[str, Any], deal_ids: List[int]) -> int:
+        """
+        Delete the rows of the given deals.
+
+        Returns:
+            int: Number of deleted rows.
+        """
+        if not deal_ids:
+            return 0
+
+        cls._instance.cursor.execute(
+            f"DELETE FROM {table_schema['table_name']} WHERE deal_id = ANY(%s)", (list(deal_ids),)
+        )
+        deleted = cls._instance.cursor.rowcount
+        cls._instance.connection.commit()
+
+        return deleted
+
+    @classmethod
+    def _get_content_hashes(cls, table_schema: Dict[str, Any]) -> Dict[int, str]:
+        """
+        Get the content hash of every synced deal, creating the sync state table if it doesn't exist.
+        """
+        cls._instance.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_schema['sync_state_table']} (
+                deal_id BIGINT PRIMARY KEY,
+                content_hash TEXT NOT NULL
+            )
+        """)
+        cls._instance.cursor.execute(f"SELECT deal_id, content_hash FROM {table_schema['sync_state_table']}")
+        hashes = dict(cls._instance.cursor.fetchall())
+        cls._instance.connection.commit()
+
+        return hashes
+
+    @classmethod
+    def _reset_content_hashes(cls, table_schema: Dict[str, Any]) -> None:
+        """
+        Forget the synced hashes after a rebuild of the table.
+
+        The next sync re-applies every sheet row over the loaded deals. The deals loaded
+        from the SQL source have no hash, so the sync never deletes them.
+        """
+        cls._instance.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_schema['sync_state_table']} (
+                deal_id BIGINT PRIMARY KEY,
+                content_hash TEXT NOT NULL
+            )
+        """)
+        cls._instance.cursor.execute(f"TRUNCATE {table_schema['sync_state_table']}")
+        cls._instance.connection.commit()
+
+    @classmethod
+    def _update_content_hashes(cls, table_schema: Dict[str, Any], hashes: Dict[int, str], deleted_ids: List[int]) -> None:
+        """
+        Store the content hashes of the written deals and forget the deleted ones.
+        """
+        if hashes:
+            cls._instance.cursor.executemany(f"""
+                INSERT INTO {table_schema['sync_state_table']} (deal_id, content_hash)
+                VALUES (%s, %s)
+                ON CONFLICT (deal_id) DO UPDATE SET content_hash = EXCLUDED.content_hash
+            """, list(hashes.items()))
+        if deleted_ids:
+            cls._instance.cursor.execute(
+                f"DELETE FROM {table_schema['sync_state_table']} WHERE deal_id = ANY(%s)", (list(deleted_ids),)
+            )
+        cls._instance.connection.commit()
+
+    @classmethod
+    def _bulk_insert_data(cls, table_schema: Dict[str, Any], data) -> int:
+        """
+        Bulk load data: stream the rows with COPY into an unlogged staging table,
+        then merge them with a single upsert (on conflict do update) and commit once.
+
+        Returns:
+            int: Number of upserted rows.
+        """
+        if not data:
+            return 0
+
+        started_at = time.perf_counter()
+        table_name = table_schema['table_name']
+        staging_table = f"{table_name}_staging"
+
+        columns = list(data[0].keys())
+        col_names = ", ".join(columns)
+        update_clause = ", ".join([f"{col}=EXCLUDED.{col}" for col in columns if col != 'deal_id'])
+
+        # Deduplicate by 'deal_id', keeping the *last* occurrence.
+        rows = list({row['deal_id']: row for row in data}.values())
+
+        try:
+            cls._instance.cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            cls._instance.cursor.execute(
+                f"CREATE UNLOGGED TABLE {staging_table} AS SELECT {col_names} FROM {table_name} WITH NO DATA"
+            )
+
+            with cls._instance.cursor.copy(f"COPY {staging_table} ({col_names}) FROM STDIN") as copy:
+                for row in tqdm(rows, desc="Copying"):
+                    copy.write_row([row[col] for col in columns])
+
+            cls._instance.cursor.execute(f"""
+                INSERT INTO {table_name} ({col_names})
+                SELECT {col_names} FROM {staging_table}
+                ON CONFLICT (deal_id) DO UPDATE SET {update_clause}
+            """)
+            cls._instance.cursor.execute(f"DROP TABLE {staging_table}")
+
+            cls._instance.connection.commit()
+        except Exception as e:
+            cls._instance.connection.rollback()
+            logging.getLogger('main').info(f"Exception Occurred while bulk loading {table_name}: {e}")
+            raise
+
+        elapsed = time.perf_counter() - started_at
+        logging.getLogger('main').info(
+            f"Bulk loaded {len(rows)} rows into {table_name} in {elapsed:.1f}s ({len(rows) / elapsed:.0f} rows/sec)."
+        )
+
+        return len(rows)
+    
+    @classmethod
+    def _get_embedding_hashes(cls, table_schema: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the deal_id, title and content hash of every stored embedding.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: The rows, or None if the embeddings table doesn't exist.
+        """
+        cls._instance.cursor.execute("SELECT to_regclass(%s)", (table_schema['table_name'],))
+        if cls._instance.cursor.fetchone()[0] is None:
+            cls._instance.connection.commit()
+            return None
+
+        cls._instance.cursor.execute(f"SELECT deal_id, title, content_hash FROM {table_schema['table_name']}")
+        rows = [{"deal_id": deal_id, "title": title, "content_hash": content_hash} for deal_id, title, content_hash in cls._instance.cursor.fetchall()]
+        cls._instance.connection.commit()
+
+        return rows
+
+    @classmethod
+    def _delete_embeddings(cls, table_schema: Dict[str, Any], title: str, deal_ids: List[int]) -> int:
+        """
+        Delete the embeddings of the given description title of the given deals.
+
+        Returns:
+            int: Number of deleted rows.
+        """
+        cls._instance.cursor.execute(
+            f"DELETE FROM {table_schema['table_name']} WHERE title = %s AND deal_id = ANY(%s)", (title, list(deal_ids))
+        )
+        deleted = cls._instance.cursor.rowcount
+        cls._instance.connection.commit()
+
+        return deleted
+
+    @classmethod
+    def _insert_embeddings(cls, table_schema: Dict[str, Any], data: List[Dict[str, Any]]) -> int:
+        """
+        COPY the embeddings in, the vectors sent as pgvector text literals, and commit once.
+
+        Returns:
+            int: Number of inserted rows.
+        """
+        columns = ["deal_id", "title", "text", "content_hash", "embedding"]
+        with cls._instance.cursor.copy(f"COPY {table_schema['table_name']} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in data:
+                embedding = "[" + ",".join(str(float(value)) for value in row["embedding"]) + "]"
+                copy.write_row([row["deal_id"], row["title"], row["text"], row["content_hash"], embedding])
+        cls._instance.connection.commit()
+
+        return len(data)
+
+    @classmethod
+    async def search_embeddings(
+        cls,
+        table_schema: Dict[str, Any],
+        query_vector: List[float],
+        deal_ids: List[int],
+        distance_threshold: float = 0,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank the deals by the cosine similarity of their best passage to the query, in one statement.
+
+        Args:
+            table_schema (Dict[str, Any]): Schema of the embeddings table.
+            query_vector (List[float]): Query embedding.
+            deal_ids (List[int]): Candidate deal ids.
+            distance_threshold (float): If set, drop the deals below this similarity, unless that leaves 3 or fewer.
+            limit (int): Maximum number of deals.
+
+        Returns:
+            List[Dict[str, Any]]: Hits shaped like Milvus search results, best first.
+        """
+        query = f"""
+            SELECT deal_id, title, similarity FROM (
+                SELECT DISTINCT ON (deal_id) deal_id, title, 1 - (embedding <=> %s::vector) AS similarity
+                FROM {table_schema['table_name']}
+                WHERE deal_id = ANY(%s::BIGINT[])
+                ORDER BY deal_id, similarity DESC
+            ) AS best_passages
+            ORDER BY similarity DESC
+            LIMIT %s
+        """
+        # The vector is bound in the text format of pgvector.
+        vector_literal = "[" + ",".join(str(float(value)) for value in query_vector) + "]"
+        rows = await cls._run_query(query, params = (vector_literal, [int(deal_id) for deal_id in deal_ids], int(limit)))
+        results = [
+            {"id": None, "distance": float(row['similarity']), "entity": {"deal_id": row['deal_id'], "title": row['title']}}
+            for row in rows
+        ]
+
+        # Filter if threshold, as RocloMilvusVectorDB.search_data does.
+        if distance_threshold:
+            filtered_results = [hit for hit in results if hit['distance'] >= distance_threshold]
+            if len(filtered_results) > 3:
+                results = filtered_results
+
+        return results
+
+    @classmethod
+    async def execute_query(cls, query: str, max_rows: Optional[int] = None) -> Dict:
         """
         Execute the cypher query and returns the records as dict.
+
+        Args:
+            query (str): The SQL query to execute.
+            max_rows (Optional[int]): If set, stream the result through a server-side cursor and stop
+                after max_rows + 1 records, so an oversized result is detected without reading the rest.
         """
+        cache_key, columns = cls._get_cache_key(query, max_rows)
+        if cache_key is not None:
+            data_version = await cls.get_data_version()
+            cached = cls._get_cached_result(cache_key, data_version)
+            if cached is not None:
+                return cls._reorder_columns(cached, columns)
+
+        data = await cls._run_query(query, max_rows)
+
+        if cache_key is not None:
+            cls._set_cached_result(cache_key, data_version, data)
+
+        return data
+
+    @classmethod
+    async def _run_query(cls, query: str, max_rows: Optional[int] = None, params: Optional[Sequence[Any]] = None) -> Dict:
+        """
+        Execute the query on the pool or on the shared connection and returns the records as dict.
+
+        Args:
+            query (str): The SQL query, with %s placeholders if params are given.
+            max_rows (Optional[int]): If set, stop after max_rows + 1 records.
+            params (Optional[Sequence[Any]]): Values bound to the placeholders of the query.
+        """
+        if cls._instance.pool is not None:
+            return await cls._execute_pooled_query(query, max_rows, params)
+
         try:
-            cls._instance.cursor.execute(query)
-            results = cls._instance.cursor.fetchall()
+            if max_rows is None:
+                cls._instance.cursor.execute(query, params)
+                results = cls._instance.cursor.fetchall()
+
+                columns = [desc[0] for desc in cls._instance.cursor.description]
+            else:
+                with cls._instance.connection.cursor(name = "roclo_bounded_fetch") as cursor:
+                    cursor.execute(query, params)
+                    results = cursor.fetchmany(max_rows + 1)
 
-            columns = [desc[0] for desc in cls._instance.cursor.description]
+                    columns = [desc[0] for desc in cursor.description]
+
+                cls._log_row_cap(results, max_rows)
 
             data = [dict(zip(columns, row)) for row in results]
 
@@ -185,11 +567,233 @@ class RocloPostgresDatabase:
             logging.getLogger('main').info(f"Exception Occurred: {e}")
             raise
     
+    @classmethod
+    async def _execute_pooled_query(cls, query: str, max_rows: Optional[int] = None, params: Optional[Sequence[Any]] = None) -> Dict:
+        """
+        Execute the query on a connection borrowed from the pool and returns the records as dict.
+        """
+        pool = await cls._get_pool()
+
+        try:
+            requested_at = time.perf_counter()
+            async with pool.connection() as connection:
+                cls._record_pool_wait(time.perf_counter() - requested_at)
+
+                if max_rows is None:
+                    async with connection.cursor() as cursor:
+                        await cursor.execute(query, params)
+                        results = await cursor.fetchall()
+
+                        columns = [desc[0] for desc in cursor.description]
+                else:
+                    async with connection.cursor(name = "roclo_bounded_fetch") as cursor:
+                        await cursor.execute(query, params)
+                        results = await cursor.fetchmany(max_rows + 1)
+
+                        columns = [desc[0] for desc in cursor.description]
+
+                    cls._log_row_cap(results, max_rows)
+
+            return [dict(zip(columns, row)) for row in results]
+
+        except Exception as e:
+            logging.getLogger('main').info(f"Exception Occurred: {e}")
+            raise
+
+    @classmethod
+    async def explain_query(cls, query: str) -> Dict[str, Any]:
+        """
+        Estimate the query with EXPLAIN (FORMAT JSON), without executing it, and return the top plan node.
+        """
+        cache_key, _ = cls._get_cache_key(query, "explain")
+        if cache_key is not None:
+            data_version = await cls.get_data_version()
+            cached = cls._get_cached_result(cache_key, data_version)
+            if cached is not None:
+                return cached
+
+        result = await cls._run_query(f"EXPLAIN (FORMAT JSON) {query}")
+
+        # The single 'QUERY PLAN' value is a JSON list holding one plan object.
+        plan = list(result[0].values())[0][0]['Plan']
+
+        if cache_key is not None:
+            cls._set_cached_result(cache_key, data_version, plan)
+
+        return plan
+
+    @classmethod
+    def _get_cache_key(cls, query: str, variant: Any = None) -> Tuple[Optional[Hashable], Optional[List[str]]]:
+        """
+        Build the result cache key from a canonical form of the query.
+
+        Whitespace, keyword and identifier case, table aliases and the order of the selected columns
+        are normalized, so queries that only differ in those share one cache entry.
+
+        Args:
+            query (str): The SQL query.
+            variant (Any): Anything else that changes the result, like the row cap.
+
+        Returns:
+            Tuple[Optional[Hashable], Optional[List[str]]]: The cache key, or None if the query can't be cached,
+                and the column order requested by the query, or None to keep the cached order.
+        """
+        if cls._instance.result_cache is None:
+            return None, None
+
+        try:
+            ast = parse_one(query, read = "postgres")
+        except Exception:
+            return None, None
+
+        # Only cache read queries.
+        if not isinstance(ast, (exp.Select, exp.Union)):
+            return None, None
+
+        ast = normalize_identifiers(ast, dialect = "postgres")
+
+        # Rename the table aliases to positional names.
+        aliases = {}
+        for table in ast.find_all(exp.Table):
+            if table.alias:
+                aliases.setdefault(table.alias, f"t{len(aliases)}")
+                table.set("alias", exp.TableAlias(this = exp.to_identifier(aliases[table.alias])))
+        for column in ast.find_all(exp.Column):
+            if column.table in aliases:
+                column.set("table", exp.to_identifier(aliases[column.table]))
+
+        # Sort the selected columns when their order doesn't change the result, apart from the key order.
+        columns = None
+        if isinstance(ast, exp.Select) and cls._has_sortable_projection(ast):
+            columns = [projection.alias_or_name for projection in ast.expressions]
+            ast.set("expressions", sorted(ast.expressions, key = lambda projection: projection.sql(dialect = "postgres")))
+
+        return (ast.sql(dialect = "postgres"), variant), columns
+
+    @classmethod
+    def _has_sortable_projection(cls, select: exp.Select) -> bool:
+        """Check that the projection can be reordered: named columns, no star and no positional references."""
+        names = [projection.alias_or_name for projection in select.expressions]
+        if not all(names) or len(set(names)) != len(names) or select.is_star:
+            return False
+
+        for clause in ("order", "group", "distinct"):
+            node = select.args.get(clause)
+            if node is None:
+                continue
+            for expression in node.find_all(exp.Literal):
+                if expression.is_int:
+                    return False
+
+        return True
+
+    @classmethod
+    def _reorder_columns(cls, data: List[Dict[str, Any]], columns: Optional[List[str]]) -> List[Dict[str, Any]]:
+        """Return the cached records with their keys in the order requested by the query."""
+        if not columns or not data or set(columns) != set(data[0].keys()):
+            return data
+
+        return [{column: row[column] for column in columns} for row in data]
+
+    @classmethod
+    def _get_cached_result(cls, cache_key: Hashable, data_version: Optional[int]) -> Any:
+        """Return the cached result if it was stored for the given data version."""
+        if data_version is None:
+            return None
+
+        entry = cls._instance.result_cache.get(cache_key)
+        if entry is None:
+            return None
+
+        cached_version, result = entry
+        if cached_version != data_version:
+            cls._instance.result_cache.pop(cache_key)
+            return None
+
+        return result
+
+    @classmethod
+    def _set_cached_result(cls, cache_key: Hashable, data_version: Optional[int], result: Any) -> None:
+        """Store the result together with the data version read before the query ran."""
+        if data_version is not None:
+            cls._instance.result_cache.set(cache_key, (data_version, result))
+
+    @classmethod
+    async def get_data_version(cls) -> Optional[int]:
+        """
+        Return the data version stamp, re-reading it from Postgres at most every data_version_check_interval seconds.
+
+        Returns:
+            Optional[int]: The data version, or None if it can't be read.
+        """
+        if time.monotonic() - cls._instance.data_version_checked_at < cls._instance.data_version_check_interval:
+            return cls._instance.data_version
+
+        try:
+            result = await cls._run_query(f"SELECT COALESCE(SUM(version), 0) AS version FROM {DATA_VERSION_TABLE}")
+            version = int(result[0]['version'])
+        except psycopg.errors.UndefinedTable:
+            # Nothing has bumped the version yet.
+            await cls.rollback()
+            version = 0
+        except Exception as e:
+            logging.getLogger('main').info(f"Failed to read the data version: {e}")
+            await cls.rollback()
+            version = None
+
+        # A new version makes every cached result stale.
+        if version != cls._instance.data_version and cls._instance.result_cache is not None:
+            cls._instance.result_cache.clear()
+        cls._instance.data_version = version
+        cls._instance.data_version_checked_at = time.monotonic()
+
+        return version
+
+    @classmethod
+    def bump_data_version(cls, table_name: str) -> None:
+        """
+        Increase the data version of the table, so cached query results are invalidated.
+
+        Args:
+            table_name (str): Name of the table whose data changed.
+        """
+        cls._instance.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DATA_VERSION_TABLE} (
+                table_name TEXT PRIMARY KEY,
+                version BIGINT NOT NULL
+            )
+        """)
+        cls._instance.cursor.execute(f"""
+            INSERT INTO {DATA_VERSION_TABLE} (table_name, version)
+            VALUES (%s, 1)
+            ON CONFLICT (table_name) DO UPDATE SET version = {DATA_VERSION_TABLE}.version + 1
+        """, (table_name,))
+        cls._instance.connection.commit()
+        logging.getLogger('main').info(f"Bumped the data version of {table_name}.")
+
+    @classmethod
+    def get_result_cache_stats(cls) -> Dict[str, Any]:
+        """Return the result cache counters."""
+        if cls._instance.result_cache is None:
+            return {}
+
+        return {**cls._instance.result_cache.stats(), "data_version": cls._instance.data_version}
+
+    @classmethod
+    def _log_row_cap(cls, results: list, max_rows: int) -> None:
+        """Log when a bounded fetch stopped because the result exceeds max_rows."""
+        if len(results) > max_rows:
+            logging.getLogger('main').info(f"Query returned more than {max_rows} rows, stopped fetching.")
+    
     @classmethod
     async def rollback(cls) -> Dict:
         """
         Rollback the transactions
         """
+        # Pooled connections roll back on error when they are returned to the pool.
+        if cls._instance.pool is not None:
+            return
+
         print("rollbacking")
         cls._instance.connection.rollback()
         logging.getLogger('main').info("Rollback is passed")
\ No newline at end of file
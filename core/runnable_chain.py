@@ -63,14 +63,18 @@
 # Add sophisticated data analytics
 # Implement sophisticated CI/CD pipeline
 # Add intelligent performance tuning
-from typing import Dict, Any, AsyncIterator
+from typing import Dict, Any, AsyncIterator, List, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.runnables.config import RunnableConfig
 from .history_manager import DynamoDBChatHistoryManager
-from langchain_core.messages import BaseMessage
-from langchain_core.runnables import ConfigurableFieldSpec
+from .history_window import WindowedChatMessageHistory
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import ConfigurableFieldSpec, Runnable, RunnableLambda
+import asyncio
 
 
 
@@ -90,7 +94,10 @@ class RocloRunnableChain:
         llm: BaseChatModel,
         input_key: str,
         history_key: str,
-        name: str
+        name: str,
+        cache_prompt: bool = True,
+        history_policy: Optional[Dict[str, Any]] = None,
+        history_summarizer: Optional[Runnable] = None
     ) -> RunnableWithMessageHistory:
         """Initialize the RocloRunnableChain with the provided components.  
 
@@ -101,10 +108,25 @@ class RocloRunnableChain:
             input_key (str): The key for input messages.  
             history_key (str): The key for history messages.  
             name (str): Name of the agent.
+            cache_prompt (bool): Mark the system prompt for the prompt caching of Anthropic models.
+                OpenAI caches the prompt prefixes automatically, the system prompt comes first and
+                the chat history next so the prefix stays the same across requests.
+            history_policy (Optional[Dict[str, Any]]): Window of the chat history shown to the model,
+                with max_turns, max_tokens and summarize. None shows the whole history.
+            history_summarizer (Optional[Runnable]): Chain summarizing the turns out of the window,
+                used when the policy sets summarize.
         """
+        if cache_prompt and getattr(llm, "_llm_type", None) == "anthropic-chat":
+            self.chain = data | prompt | RunnableLambda(_mark_system_prompt_cache) | llm
+        else:
+            self.chain = data | prompt | llm
+        self.input_key = input_key
+        self.history_key = history_key
+        self.history_policy = history_policy
+        self.history_summarizer = history_summarizer
         self.runnable_chain = RunnableWithMessageHistory(
-            data | prompt | llm,
-            DynamoDBChatHistoryManager.get_chat_history,
+            self.chain,
+            self.get_chat_history,
             input_messages_key = input_key,
             history_messages_key = history_key,
             history_factory_config=[
@@ -150,6 +172,89 @@ class RocloRunnableChain:
     
 
 
+    def get_chat_history(self, table_id: str, session_id: str) -> BaseChatMessageHistory:
+        """Return the chat history of the session, windowed by the history policy of the chain.
+
+        Args:
+            table_id (str): The ID of the table.
+            session_id (str): The ID of the session.
+
+        Returns:
+            BaseChatMessageHistory: The chat history shown to the model.
+        """
+        history = DynamoDBChatHistoryManager.get_chat_history(table_id, session_id)
+        if not self.history_policy:
+            return history
+
+        summarize = self.history_policy.get('summarize') and self.history_summarizer is not None
+        return WindowedChatMessageHistory(
+            history,
+            # The summary is saved in the same table, next to the history of the session.
+            summary_history = DynamoDBChatHistoryManager.get_chat_history(table_id, f"{session_id}#summary") if summarize else None,
+            max_turns = self.history_policy.get('max_turns'),
+            max_tokens = self.history_policy.get('max_tokens'),
+            summarizer = self.history_summarizer if summarize else None,
+            key = f"{table_id}/{session_id}"
+        )
+
+
+
+    @staticmethod
+    def get_usage(message: BaseMessage) -> Dict[str, Any]:
+        """Return the token usage of the response, with the cached input tokens.
+
+        Args:
+            message (BaseMessage): The response, or the sum of the streamed chunks.
+
+        Returns:
+            Dict[str, Any]: The usage metadata, with cached_tokens read from the prompt cache
+                and cache_creation_tokens written to it.
+        """
+        usage = dict(getattr(message, "usage_metadata", None) or {})
+        details = usage.get("input_token_details") or {}
+        usage["cached_tokens"] = details.get("cache_read", 0)
+        usage["cache_creation_tokens"] = details.get("cache_creation", 0)
+        return usage
+
+
+
+    async def ainvoke_without_saving(self, input:Dict[str, Any], config:RunnableConfig) -> BaseMessage:
+        """Invoke the chain with the chat history, without adding the turn to the history.
+
+        Used for speculative calls whose result may be discarded; call save_turn() to keep it.
+
+        Args:
+            input (Dict[str, Any]): The input data for the invocation.
+            config (RunnableConfig): The configuration for the runnable, with the table_id and session_id.
+
+        Returns:
+            BaseMessage: The response from the language model.
+        """
+        history = self.get_chat_history(
+            config['configurable']['table_id'],
+            config['configurable']['session_id']
+        )
+        messages = await asyncio.to_thread(lambda: history.messages)
+        return await self.chain.ainvoke({**input, self.history_key: messages}, config)
+
+
+
+    async def save_turn(self, input:Dict[str, Any], output:BaseMessage, config:RunnableConfig) -> None:
+        """Add the turn of a call made with ainvoke_without_saving() to the chat history.
+
+        Args:
+            input (Dict[str, Any]): The input data of the invocation.
+            output (BaseMessage): The response from the language model.
+            config (RunnableConfig): The configuration for the runnable, with the table_id and session_id.
+        """
+        history = self.get_chat_history(
+            config['configurable']['table_id'],
+            config['configurable']['session_id']
+        )
+        await asyncio.to_thread(history.add_messages, [HumanMessage(content = input[self.input_key]), output])
+
+
+
     async def astream(self, input:Dict, config:RunnableConfig) -> AsyncIterator[BaseMessage]:
         """Stream the output of the runnable chain asynchronously.  
 
@@ -167,4 +272,17 @@ class RocloRunnableChain:
             async for chunk in self.runnable_chain.astream(input, config):  
                 yield chunk # Yield each chunk as it's retrieved.
         except Exception as e:
-            raise
\ No newline at end of file
+            raise
+
+
+
+def _mark_system_prompt_cache(prompt_value: PromptValue) -> List[BaseMessage]:
+    """Mark the end of the system prompt as a cache breakpoint for Anthropic."""
+    messages = prompt_value.to_messages()
+    for i, message in enumerate(messages):
+        if isinstance(message, SystemMessage) and isinstance(message.content, str):
+            messages[i] = SystemMessage(content = [
+                {"type": "text", "text": message.content, "cache_control": {"type": "ephemeral"}}
+            ])
+            break
+    return messages
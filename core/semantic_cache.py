@@ -0,0 +1,112 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import numpy as np
+import threading
+import time
+
+
+class SemanticCache:
+    """
+    Bounded cache of answers, looked up by the cosine similarity of the question embeddings.
+
+    Every entry is stamped with the data version it was computed from, and only matches
+    while that version is current. An entry can also carry an exact key, like the numbers
+    of the question, that must be equal for it to match. Least recently used entries are evicted first.
+
+    Attributes:
+        max_size (int): Maximum number of entries kept in the cache.
+        ttl (Optional[float]): Seconds an entry stays valid, or None to keep it until it is evicted.
+        threshold (float): Minimum cosine similarity between two questions to reuse an answer.
+    """
+    def __init__(self, max_size: int = 512, ttl: Optional[float] = None, threshold: float = 0.92):
+        """Initialize an empty cache.
+
+        Args:
+            max_size (int): Maximum number of entries kept in the cache.
+            ttl (Optional[float]): Seconds an entry stays valid, or None to keep it until it is evicted.
+            threshold (float): Minimum cosine similarity between two questions to reuse an answer.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._items: OrderedDict = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+
+    def get(self, vector: np.ndarray, data_version: Any, exact_key: Hashable = None) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """
+        Return the similarity and the value of the most similar question above the threshold, or None.
+
+        Only the entries stored with the same exact key are compared. Entries of another data
+        version or past their ttl are dropped on the way.
+        """
+        vector = self._normalize(vector)
+        with self._lock:
+            now = time.monotonic()
+            for key, (_, version, _, stored_at, _) in list(self._items.items()):
+                if version != data_version or (self.ttl is not None and now - stored_at > self.ttl):
+                    del self._items[key]
+                    self.stale += 1
+
+            keys = [key for key, item in self._items.items() if item[4] == exact_key]
+            if not keys:
+                self.misses += 1
+                return None
+
+            scores = np.stack([self._items[key][0] for key in keys]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(keys[best])
+            self.hits += 1
+            return float(scores[best]), self._items[keys[best]][2]
+
+
+    def set(self, vector: np.ndarray, data_version: Any, value: Dict[str, Any], exact_key: Hashable = None) -> None:
+        """Store the value of the question, evicting the least recently used entries when the cache is full."""
+        vector = self._normalize(vector)
+        with self._lock:
+            self._items[self._next_key] = (vector, data_version, value, time.monotonic(), exact_key)
+            self._next_key += 1
+
+            while len(self._items) > self.max_size:
+                self._items.popitem(last = False)
+                self.evictions += 1
+
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._items.clear()
+
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit, miss, stale and eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stale": self.stale,
+                "evictions": self.evictions
+            }
+
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype = np.float32)
+        return vector / (np.linalg.norm(vector) or 1)
+
+
+    def __len__(self) -> int:
+        return len(self._items)
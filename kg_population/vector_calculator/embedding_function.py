@@ -2,8 +2,12 @@
 # Refactor: Refactor UI components for reusability
 # Test: Add security tests for authentication
 import os
-from typing import List, Optional
+import asyncio
+import logging
+import random
+from typing import Any, List, Optional
 
+import aiohttp
 import numpy as np
 import requests
 import time
@@ -12,6 +16,9 @@ from milvus_model.base import BaseEmbeddingFunction
 
 API_URL = "https://api.jina.ai/v1/embeddings"
 
+# HTTP statuses worth retrying: rate limit and server side errors.
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
 
 class JinaEmbeddingFunction(BaseEmbeddingFunction):
     def __init__(
@@ -21,7 +28,12 @@ class JinaEmbeddingFunction(BaseEmbeddingFunction):
         task: str = "text-matching",
         dimensions = 1024,
         late_chunking = False,
-        embedding_type: str = "float"
+        embedding_type: str = "float",
+        max_attempts: int = 5,
+        timeout: float = 60,
+        backoff_base: float = 1,
+        backoff_max: float = 30,
+        max_connections: int = 10
     ):
         if api_key is None:
             if "JINAAI_API_KEY" in os.environ and os.environ["JINAAI_API_KEY"]:
@@ -35,15 +47,20 @@ class JinaEmbeddingFunction(BaseEmbeddingFunction):
                 raise ValueError(error_message)
         else:
             self.api_key = api_key
+        self._headers = {"Authorization": f"Bearer {self.api_key}", "Accept-Encoding": "identity"}
         self._session = requests.Session()
-        self._session.headers.update(
-            {"Authorization": f"Bearer {self.api_key}", "Accept-Encoding": "identity"}
-        )
+        self._session.headers.update(self._headers)
+        self._async_session: Optional[aiohttp.ClientSession] = None
         self.model_name = model_name
         self.task = task
         self.dimensions = dimensions
         self.late_chunking = late_chunking
         self.embedding_type = embedding_type
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_connections = max_connections
         self._dim = None
 
     @property
@@ -61,16 +78,94 @@ class JinaEmbeddingFunction(BaseEmbeddingFunction):
     def __call__(self, texts: List[str]) -> List[np.array]:
         return self._call_jina_api(texts)
 
+    async def aencode_queries(self, queries: List[str]) -> List[np.array]:
+        return await self._acall_jina_api(queries)
+
+    async def aencode_documents(self, documents: List[str]) -> List[np.array]:
+        return await self._acall_jina_api(documents)
+
+    async def aclose(self) -> None:
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+
     def _call_jina_api(self, texts: List[str]):
-        resp = self._session.post(  # type: ignore[assignment]
-            API_URL, json={"input": texts, "model": self.model_name, "task":self.task, "dimensions":self.dimensions,
-                           "late_chunking":self.late_chunking, "embedding_type":self.embedding_type},
-        ).json()
-        if "data" not in resp:
-            time.sleep(5)
-            return self._call_jina_api(texts)
-            # raise RuntimeError(resp["detail"])
+        for attempt in range(self.max_attempts):
+            try:
+                resp = self._session.post(  # type: ignore[assignment]
+                    API_URL, json=self._build_payload(texts), timeout=self.timeout
+                )
+                status, body = resp.status_code, resp.json()
+            except (requests.Timeout, requests.ConnectionError, ValueError) as e:
+                status, body = None, {"detail": str(e)}
+
+            if self._is_success(status, body):
+                return self._parse_embeddings(body)
+            self._raise_if_not_retryable(status, body)
+
+            if attempt < self.max_attempts - 1:
+                time.sleep(self._get_backoff_delay(attempt, status, body))
+
+        raise RuntimeError(f"Jina embedding request failed after {self.max_attempts} attempts: {self._get_detail(body)}")
+
+    async def _acall_jina_api(self, texts: List[str]):
+        session = self._get_async_session()
+
+        for attempt in range(self.max_attempts):
+            try:
+                async with session.post(API_URL, json=self._build_payload(texts)) as resp:
+                    status, body = resp.status, await resp.json(content_type=None)
+            except (asyncio.TimeoutError, aiohttp.ClientError, ValueError) as e:
+                status, body = None, {"detail": str(e)}
+
+            if self._is_success(status, body):
+                return self._parse_embeddings(body)
+            self._raise_if_not_retryable(status, body)
+
+            if attempt < self.max_attempts - 1:
+                await asyncio.sleep(self._get_backoff_delay(attempt, status, body))
+
+        raise RuntimeError(f"Jina embedding request failed after {self.max_attempts} attempts: {self._get_detail(body)}")
+
+    def _get_async_session(self) -> aiohttp.ClientSession:
+        # The session keeps a pool of connections to the API, so it's reused across calls.
+        if self._async_session is None or self._async_session.closed:
+            self._async_session = aiohttp.ClientSession(
+                headers=self._headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.max_connections)
+            )
+        return self._async_session
+
+    def _build_payload(self, texts: List[str]) -> dict:
+        return {"input": texts, "model": self.model_name, "task":self.task, "dimensions":self.dimensions,
+                "late_chunking":self.late_chunking, "embedding_type":self.embedding_type}
+
+    @staticmethod
+    def _is_success(status: Optional[int], body: dict) -> bool:
+        return status == 200 and isinstance(body, dict) and "data" in body
+
+    @staticmethod
+    def _raise_if_not_retryable(status: Optional[int], body: dict) -> None:
+        # Client errors (bad key, invalid input, ...) won't succeed on retry.
+        if status is not None and status != 200 and status not in RETRYABLE_STATUSES:
+            raise RuntimeError(f"Jina embedding request failed with status {status}: {JinaEmbeddingFunction._get_detail(body)}")
+
+        logging.getLogger('main').info(f"Jina embedding request failed with status {status}, retrying.")
+
+    @staticmethod
+    def _get_detail(body: Any) -> Any:
+        # The error body may be a list or a string rather than a dict.
+        return body.get("detail", body) if isinstance(body, dict) else body
+
+    def _get_backoff_delay(self, attempt: int, status: Optional[int], body: dict) -> float:
+        # Exponential backoff with jitter, slower after a rate limit error.
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        if status == 429:
+            delay = min(self.backoff_max, delay * 2)
+        return random.uniform(delay / 2, delay)
 
+    @staticmethod
+    def _parse_embeddings(resp: dict):
         embeddings = resp["data"]
 
         # Sort resulting embeddings by index
@@ -1,7 +1,135 @@
-from pymilvus import DataType
+from pymilvus import DataType, FunctionType
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import ml_dtypes
+
+# Build and search params of the supported ANN index types.
+vector_index_presets = {
+    "FLAT": {"build": {}, "search": {}},
+    "HNSW": {"build": {"M": 16, "efConstruction": 200}, "search": {"ef": 128}},
+    "IVF_FLAT": {"build": {"nlist": 1024}, "search": {"nprobe": 32}},
+    "IVF_SQ8": {"build": {"nlist": 1024}, "search": {"nprobe": 32}},
+    "IVF_PQ": {"build": {"nlist": 1024, "m": 64, "nbits": 8}, "search": {"nprobe": 32}},
+    "SCANN": {"build": {"nlist": 1024, "with_raw_data": True}, "search": {"nprobe": 32, "reorder_k": 200}},
+    "DISKANN": {"build": {}, "search": {"search_list": 100}},
+    # Indexes of BINARY vectors, searched with the HAMMING metric.
+    "BIN_FLAT": {"build": {}, "search": {}},
+    "BIN_IVF_FLAT": {"build": {"nlist": 1024}, "search": {"nprobe": 32}},
+}
+
+# Milvus field types of the supported vector storage types, and their size in bits per dimension.
+# FLOAT16 and BFLOAT16 need Milvus 2.4 or later.
+vector_storage_types = {
+    "FLOAT": {"datatype": DataType.FLOAT_VECTOR, "bits": 32},
+    "FLOAT16": {"datatype": DataType.FLOAT16_VECTOR, "bits": 16},
+    "BFLOAT16": {"datatype": DataType.BFLOAT16_VECTOR, "bits": 16},
+    "BINARY": {"datatype": DataType.BINARY_VECTOR, "bits": 1},
+}
+
+
+def get_vector_index(
+    index_type: str,
+    metric_type: str = "COSINE",
+    build_params: Optional[Dict[str, Any]] = None,
+    search_params: Optional[Dict[str, Any]] = None,
+    field_name: str = "vector"
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Build the index params and the search params of a vector field.
+
+    Args:
+        index_type (str): One of the vector_index_presets index types.
+        metric_type (str): Similarity metric.
+        build_params (Optional[Dict[str, Any]]): Overrides of the preset build params.
+        search_params (Optional[Dict[str, Any]]): Overrides of the preset search params.
+        field_name (str): Name of the vector field.
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Any]]: The entry for 'index_params', and the search params.
+    """
+    preset = vector_index_presets[index_type]
+    index_param = {
+        "field_name":field_name,
+        "index_type":index_type,
+        "metric_type":metric_type,
+        "params":{**preset["build"], **(build_params or {})},
+    }
+    search_param = {
+        "metric_type":metric_type,
+        "params":{**preset["search"], **(search_params or {})},
+    }
+    return index_param, search_param
+
+
+def encode_vector(vector: Any, vector_type: str) -> Any:
+    """
+    Convert an embedding to the value Milvus expects for the vector storage type.
+
+    FLOAT16 and BFLOAT16 vectors are sent as their raw bytes, and BINARY vectors keep
+    the sign of every dimension, packed 8 dimensions per byte.
+    """
+    vector = np.asarray(vector, dtype = np.float32)
+    if vector_type == "FLOAT":
+        return vector.tolist()
+    if vector_type == "FLOAT16":
+        return vector.astype(np.float16).tobytes()
+    if vector_type == "BFLOAT16":
+        # bfloat16 is the upper half of the float32, rounded to nearest even.
+        bits = vector.view(np.uint32)
+        bits = bits + 0x7FFF + ((bits >> 16) & 1)
+        return (bits >> 16).astype(np.uint16).tobytes()
+    if vector_type == "BINARY":
+        return np.packbits(vector > 0).tobytes()
+    raise ValueError(f"Unsupported vector type: {vector_type}")
+
+
+def encode_query_vector(vector: Any, vector_type: str) -> Any:
+    """
+    Convert a query embedding to the search data Milvus expects for the vector storage type.
+
+    pymilvus takes any bytes query for a BINARY vector, so FLOAT16 and BFLOAT16 queries are
+    sent as arrays of their dtype, and only BINARY queries as packed bytes.
+    """
+    if vector_type == "FLOAT16":
+        return np.asarray(vector, dtype = np.float32).astype(np.float16)
+    if vector_type == "BFLOAT16":
+        return np.asarray(vector, dtype = np.float32).astype(ml_dtypes.bfloat16)
+    return encode_vector(vector, vector_type)
+
+
+def decode_vector(value: Any, vector_type: str) -> np.ndarray:
+    """
+    Convert a vector read from Milvus back to float32, BINARY vectors become -1/+1 per dimension.
+    """
+    if vector_type == "FLOAT":
+        return np.asarray(value, dtype = np.float32)
+    # Milvus returns the other vector types as a list holding the raw bytes.
+    raw = value[0] if isinstance(value, list) else value
+    if vector_type == "FLOAT16":
+        return np.frombuffer(raw, dtype = np.float16).astype(np.float32)
+    if vector_type == "BFLOAT16":
+        return (np.frombuffer(raw, dtype = np.uint16).astype(np.uint32) << 16).view(np.float32)
+    if vector_type == "BINARY":
+        return np.unpackbits(np.frombuffer(raw, dtype = np.uint8)).astype(np.float32) * 2 - 1
+    raise ValueError(f"Unsupported vector type: {vector_type}")
+
+
+# Storage of the description vectors, compare the options with vector_benchmark.py.
+# jina-embeddings-v3 is a Matryoshka model, so 256 or 512 dimensions keep most of the ranking quality.
+vector_type = "FLOAT"
+vector_dimensions = 1024
+
+# ANN index of the description vectors, choose it with vector_benchmark.py.
+# BINARY vectors need a BIN_* index with the HAMMING metric.
+vector_index_param, vector_search_param = get_vector_index(
+    "BIN_FLAT" if vector_type == "BINARY" else "FLAT",
+    metric_type = "HAMMING" if vector_type == "BINARY" else "COSINE"
+)
 
 vector_schema = {
     "collection_name":"company_descriptions",  
+    # Where the description vectors are stored and searched, "milvus" or "pgvector" (see pgvector_schema).
+    "backend":"milvus",
     "schema":{
         "auto_id":True,
         "enable_dynamic_field":False,
@@ -25,10 +153,15 @@ vector_schema = {
                 "datatype":DataType.VARCHAR,
                 "max_length":20480
             },
+            {
+                "field_name":"content_hash",
+                "datatype":DataType.VARCHAR,
+                "max_length":64
+            },
             {
                 "field_name":"vector",
-                "datatype":DataType.FLOAT_VECTOR,
-                "dim":1024,
+                "datatype":vector_storage_types[vector_type]["datatype"],
+                "dim":vector_dimensions,
             }
         ]
     },
@@ -49,19 +182,82 @@ vector_schema = {
             "field_name":"title",
             "index_type":"Trie"
         },
-        {
-            "field_name":"vector",
-            "index_type":"FLAT",
-            "metric_type":"COSINE",
-        }
+        vector_index_param
     ],
+    "search_params":vector_search_param,
+    # Fusion of the dense and the BM25 rankings in hybrid_search, "rrf" or "weighted".
+    # If enabled, the prioritizer ranks with hybrid_search, which has no similarity threshold.
+    # The BM25 fields need Milvus 2.5 or later, they are only added to the schema when enabled.
+    "hybrid":{
+        "enabled":False,
+        "ranker":"rrf",
+        "rrf_k":60,
+        "weights":[0.7, 0.3],
+        "sparse_search_params":{"metric_type":"BM25", "params":{"drop_ratio_search":0.2}},
+    },
+    # In-process copy of the vectors, to rerank small candidate sets without calling Milvus.
+    "local_store":{
+        "dir":"./vector_store/company_descriptions",
+        "max_candidates":1000,
+        "fields":["id", "deal_id", "title"],
+    },
     "values":{
         "table":"descriptions",
         "vector_col":"text",
         "model":"jina-embeddings-v3",
         "task":"retrieval.passage",
-        "dimensions":1024,
+        "dimensions":vector_dimensions,
+        "vector_type":vector_type,
         "target_keys": ["target_business_description", "buyer_business_description", "seller_business_description"],
-        "metadata":["deal_id", "text", "title"],
+        "metadata":["deal_id", "text", "title", "content_hash"],
+        # Descriptions are split into passages of at most max_tokens, each passage is a vector
+        # and a deal is scored by its best passage. With late_chunking, the passages of a
+        # description are embedded in one request, so each keeps the context of the whole text.
+        "chunking":{
+            "max_tokens":512,
+            "overlap_tokens":64,
+            "late_chunking":False,
+        },
     }
-}
\ No newline at end of file
+}
+
+if vector_schema['hybrid']['enabled']:
+    # The text is tokenized for the BM25 function, which Milvus computes on insert.
+    next(field for field in vector_schema['schema']['schema'] if field['field_name'] == "text")["enable_analyzer"] = True
+    vector_schema['schema']['schema'].append({
+        "field_name":"sparse",
+        "datatype":DataType.SPARSE_FLOAT_VECTOR
+    })
+    vector_schema['schema']['functions'] = [
+        {
+            "name":"text_bm25",
+            "function_type":FunctionType.BM25,
+            "input_field_names":["text"],
+            "output_field_names":["sparse"]
+        }
+    ]
+    vector_schema['index_params'].append({
+        "field_name":"sparse",
+        "index_type":"SPARSE_INVERTED_INDEX",
+        "metric_type":"BM25"
+    })
+
+# The description vectors in Postgres, for the "pgvector" backend. The vectors are stored as float32,
+# and the searches are filtered by deal_id, so the deal_id index serves them without an ANN index.
+pgvector_schema = {
+    "table_name":"oaklins_deal_embeddings",
+    "creation_sql":f"""
+        CREATE EXTENSION IF NOT EXISTS vector;
+        CREATE TABLE oaklins_deal_embeddings (
+            id BIGSERIAL PRIMARY KEY,
+            deal_id BIGINT NOT NULL,
+            title TEXT NOT NULL,
+            text TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            embedding vector({vector_dimensions}) NOT NULL
+        );
+    """,
+    "index_sql":"""
+        CREATE INDEX IF NOT EXISTS idx_deal_embeddings_deal_id ON oaklins_deal_embeddings(deal_id);
+    """,
+}
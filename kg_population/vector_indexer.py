@@ -4,58 +4,399 @@
 # Refactor: Optimize vector search algorithms
 # Refactor: Optimize caching strategies
 from tqdm import tqdm
-from kg_population.vector_calculator.vector_schmea import vector_schema
+from kg_population.vector_calculator.vector_schmea import vector_schema, pgvector_schema, encode_vector
 from kg_population.vector_calculator.embedding_function import JinaEmbeddingFunction
-from typing import List, Dict, Any
-from core import RocloMilvusVectorDB
+from typing import List, Dict, Any, Optional
+from core import RocloMilvusVectorDB, RocloPostgresDatabase
 from config import Credentials
 from utils import (
     get_business_descriptions_for_oaklins,
     split_dict_with_text_list
 )
+from dataclasses import dataclass
+import asyncio
+import hashlib
 import logging
+import re
+import tiktoken
+import time
 
-def index_vector(data: Dict[str, List[Dict[str, Any]]]) -> None:
+encoding = tiktoken.get_encoding('cl100k_base')
+
+def index_vector(
+    data: Dict[str, List[Dict[str, Any]]],
+    incremental: bool = False,
+    batch_size: int = 512,
+    max_in_flight: int = 4,
+    max_requests_per_minute: float = 60,
+    max_tokens_per_minute: float = 2000000,
+    backend: Optional[str] = None
+) -> None:
     """
-    Index the vector to Milvus.
+    Index the vector to Milvus, or to Postgres with pgvector.
+
+    Descriptions are split into passages of at most the chunking max_tokens, each stored as its own
+    vector. Embedding requests run concurrently, and each embedded batch is inserted into Milvus
+    while the next batches are being embedded.
 
     Args:
         data (List[Dict[str, Any]]): Data need to be indexed.
+        incremental (bool): If True, keep the collection and only embed the new or changed descriptions,
+            removing the vectors of changed and vanished ones. Every inserted batch is stored with its
+            content hash, so an interrupted run resumes where it stopped. sheet_monitor.py runs it after
+            every sync that inserts, changes or deletes deals.
+        batch_size (int): Number of passages per embedding request, the passages of a description always share a request.
+        max_in_flight (int): Maximum number of concurrent embedding requests.
+        max_requests_per_minute (float): Embedding request budget.
+        max_tokens_per_minute (float): Embedding token budget, estimated with the cl100k_base encoding.
+        backend (Optional[str]): "milvus" or "pgvector", defaults to vector_schema['backend'].
     """
-    # Create the collection.
-    RocloMilvusVectorDB.create_collection(vector_schema)
-    logging.getLogger('main').info(f"Indexing {vector_schema['collection_name']}...")
+    backend = backend or vector_schema['backend']
+    collection_name = vector_schema['collection_name'] if backend == "milvus" else pgvector_schema['table_name']
 
     # Get descriptions from data
     business_descriptions = get_business_descriptions_for_oaklins(data, vector_schema['values']['target_keys'])
+    for description in business_descriptions:
+        description['content_hash'] = _hash_description(description)
     logging.getLogger('main').info(f"Got descriptions from Oaklins, Size is {len(business_descriptions)}")
 
+    indexed_entities = _get_indexed_entities(backend) if incremental else None
+    if indexed_entities is not None:
+        business_descriptions = _prepare_incremental_index(business_descriptions, indexed_entities, backend)
+    else:
+        if incremental:
+            logging.getLogger('main').info(f"{collection_name} doesn't exist or doesn't match its schema, rebuilding it.")
+
+        # Create the collection.
+        if backend == "pgvector":
+            RocloPostgresDatabase._create_table(pgvector_schema)
+        else:
+            RocloMilvusVectorDB.create_collection(vector_schema)
+    logging.getLogger('main').info(f"Indexing {collection_name}...")
+
+    chunking = vector_schema['values']['chunking']
+
     # Define the Jina embedding function.
     ef = JinaEmbeddingFunction(
         vector_schema['values']['model'],
         Credentials.get_secret("JINAAI_API_KEY"),
         task = vector_schema['values']['task'],
-        dimensions = vector_schema['values']['dimensions']
+        dimensions = vector_schema['values']['dimensions'],
+        late_chunking = chunking['late_chunking'],
+        max_connections = max_in_flight
     )
 
     # Calculating jinaai embeddings from input file by send batch request.
-    progress_bar = tqdm(
-        total = len(business_descriptions)//512 + 1, 
-        desc = f"----Indexing {vector_schema['collection_name']}..."
+    # Late chunking embeds the whole request as one text, so it sends one description per request.
+    passages = _chunk_descriptions(business_descriptions, chunking['max_tokens'], chunking['overlap_tokens'])
+    batches = _batch_passages(passages, 1 if chunking['late_chunking'] else batch_size)
+    logging.getLogger('main').info(f"Split {len(business_descriptions)} descriptions into {sum(len(p) for p in passages)} passages.")
+    tracker = asyncio.run(
+        _index_batches(batches, ef, max_in_flight, max_requests_per_minute, max_tokens_per_minute, backend)
+    )
+
+    if backend == "milvus":
+        # Refresh the local copy of the vectors, used by search_data for small candidate sets.
+        RocloMilvusVectorDB.load_collection(collection_name)
+        RocloMilvusVectorDB.export_local_store(collection_name, [item["deal_id"] for item in data])
+
+        RocloMilvusVectorDB.release_collection(collection_name= collection_name)
+
+    logging.getLogger('main').info(
+        f"{collection_name} indexed: {tracker.num_documents} passages in {tracker.total_seconds:.1f}s "
+        f"({tracker.num_documents / max(tracker.total_seconds, 1e-9):.1f} docs/sec). "
+        f"Embedding: {tracker.embedding_seconds:.1f}s busy, {tracker.num_documents / max(tracker.embedding_seconds, 1e-9):.1f} docs/sec. "
+        f"{backend} insert: {tracker.insert_seconds:.1f}s busy, {tracker.num_documents / max(tracker.insert_seconds, 1e-9):.1f} docs/sec."
+    )
+
+
+
+def _hash_description(description: Dict[str, Any]) -> str:
+    """
+    Hash the description text together with the embedding and chunking settings, so changing them re-embeds everything.
+    """
+    values = vector_schema['values']
+    chunking = values['chunking']
+    content = (
+        f"{values['model']}|{values['task']}|{values['dimensions']}|"
+        f"{chunking['max_tokens']}|{chunking['overlap_tokens']}|{chunking['late_chunking']}|"
+        f"{description[values['vector_col']]}"
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+
+def _split_passages(text: str, max_tokens: int, overlap_tokens: int) -> List[str]:
+    """
+    Split the text into passages of at most max_tokens, on sentence boundaries where possible.
+
+    Consecutive passages share up to overlap_tokens of trailing sentences, so a statement cut
+    by the split is still whole in one of them.
+    """
+    if len(encoding.encode(text)) <= max_tokens:
+        return [text]
+
+    # Sentences, with the ones longer than a passage cut by tokens.
+    units = []
+    for sentence in re.split(r'(?<=[.!?])\s+', text.strip()):
+        sentence_tokens = encoding.encode(sentence)
+        for i in range(0, len(sentence_tokens), max_tokens):
+            piece = sentence_tokens[i:i+max_tokens]
+            units.append((encoding.decode(piece), len(piece)))
+
+    passages, current = [], []
+    for unit in units:
+        if current and sum(n for _, n in current) + unit[1] > max_tokens:
+            passages.append(" ".join(t for t, _ in current))
+
+            overlap = []
+            for previous in reversed(current):
+                if sum(n for _, n in overlap) + previous[1] > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+            while overlap and sum(n for _, n in overlap) + unit[1] > max_tokens:
+                overlap.pop(0)
+            current = overlap
+        current.append(unit)
+
+    if current:
+        passages.append(" ".join(t for t, _ in current))
+    return passages
+
+
+
+def _chunk_descriptions(business_descriptions: List[Dict[str, Any]], max_tokens: int, overlap_tokens: int) -> List[List[Dict[str, Any]]]:
+    """
+    Split every description into passages, which keep the metadata of their description.
+
+    Returns:
+        List[List[Dict[str, Any]]]: The passages of each description.
+    """
+    vector_col = vector_schema['values']['vector_col']
+    return [
+        [{**description, vector_col: passage} for passage in _split_passages(description[vector_col], max_tokens, overlap_tokens)]
+        for description in business_descriptions
+    ]
+
+
+
+def _batch_passages(passages: List[List[Dict[str, Any]]], batch_size: int) -> List[List[Dict[str, Any]]]:
+    """
+    Pack the passages of whole descriptions into batches of about batch_size passages.
+
+    A description is never split across batches, so an interrupted incremental run can't leave
+    it half indexed behind a matching content hash.
+    """
+    batches, current = [], []
+    for description_passages in passages:
+        if current and len(current) + len(description_passages) > batch_size:
+            batches.append(current)
+            current = []
+        current.extend(description_passages)
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+
+def _matches_schema(collection_name: str) -> bool:
+    """
+    Check that the collection has every field of vector_schema, and stores the vectors with its type and dimensions.
+    """
+    expected_fields = vector_schema['schema']['schema']
+    if not all(RocloMilvusVectorDB.has_field(collection_name, field['field_name']) for field in expected_fields):
+        return False
+
+    expected = next(field for field in expected_fields if field['field_name'] == 'vector')
+    field = RocloMilvusVectorDB.get_field(collection_name, 'vector')
+    return (
+        field['type'] == expected['datatype']
+        and int(field.get('params', {}).get('dim', 0)) == expected['dim']
     )
-    for i in range(0,len(business_descriptions), 512):
-        batch_data = business_descriptions[i:i+512]
-        devcs = ef.encode_documents([doc[vector_schema['values']['vector_col']] for doc in batch_data])
-        vector_data = [
-            {**{k: batch_data[i][k] for k in vector_schema['values']['metadata']}, "vector":devcs[i]}
-            for i in range(len(batch_data))
-        ]
-        RocloMilvusVectorDB.insert_data(
-            collection_name=vector_schema['collection_name'],
-            data = vector_data
-        )
-        progress_bar.update(1)
-
-    RocloMilvusVectorDB.release_collection(collection_name= vector_schema['collection_name'])
-
-    logging.getLogger('main').info(f"{vector_schema['collection_name']} indexed.")
\ No newline at end of file
+
+
+
+def _get_indexed_entities(backend: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Read the deal_id, title and content hash of every indexed passage.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: The entities, or None if the collection must be rebuilt.
+    """
+    if backend == "pgvector":
+        return RocloPostgresDatabase._get_embedding_hashes(pgvector_schema)
+
+    collection_name = vector_schema['collection_name']
+    if not _matches_schema(collection_name):
+        return None
+
+    RocloMilvusVectorDB.load_collection(collection_name)
+    return RocloMilvusVectorDB.query_all(collection_name, ["deal_id", "title", "content_hash"])
+
+
+
+def _prepare_incremental_index(business_descriptions: List[Dict[str, Any]], indexed_entities: List[Dict[str, Any]], backend: str) -> List[Dict[str, Any]]:
+    """
+    Compare the descriptions with the indexed content hashes, delete the vectors of the changed and
+    vanished descriptions, and return the descriptions that need to be embedded.
+    """
+    collection_name = vector_schema['collection_name'] if backend == "milvus" else pgvector_schema['table_name']
+
+    indexed_hashes = {}
+    for entity in indexed_entities:
+        indexed_hashes.setdefault((entity['deal_id'], entity['title']), set()).add(entity['content_hash'])
+
+    current_hashes = {(description['deal_id'], description['title']): description['content_hash'] for description in business_descriptions}
+
+    new_keys = {key for key in current_hashes if key not in indexed_hashes}
+    changed_keys = {key for key in current_hashes if key in indexed_hashes and indexed_hashes[key] != {current_hashes[key]}}
+    vanished_keys = {key for key in indexed_hashes if key not in current_hashes}
+
+    # Delete the stale vectors, grouped by title.
+    stale_deal_ids = {}
+    for deal_id, title in changed_keys | vanished_keys:
+        stale_deal_ids.setdefault(title, []).append(deal_id)
+    for title, deal_ids in stale_deal_ids.items():
+        if backend == "pgvector":
+            RocloPostgresDatabase._delete_embeddings(pgvector_schema, title, deal_ids)
+        else:
+            RocloMilvusVectorDB.delete_data(collection_name, f'title == "{title}" and deal_id in {deal_ids}')
+
+    logging.getLogger('main').info(
+        f"Incremental indexing of {collection_name}: {len(new_keys)} new, {len(changed_keys)} changed, "
+        f"{len(vanished_keys)} vanished, {len(current_hashes) - len(new_keys) - len(changed_keys)} unchanged."
+    )
+
+    keys_to_embed = new_keys | changed_keys
+    return [
+        description for description in business_descriptions
+        if (description['deal_id'], description['title']) in keys_to_embed
+    ]
+
+
+
+@dataclass
+class IndexingTracker:
+    """Stores the progress and the time spent in each stage of the indexing."""
+
+    num_documents: int = 0
+    embedding_seconds: float = 0  # sum of the embedding request durations
+    insert_seconds: float = 0  # sum of the Milvus insert durations
+    total_seconds: float = 0  # wall clock time of the whole pipeline
+
+
+
+@dataclass
+class RateLimiter:
+    """Throttles requests to stay under a requests-per-minute and a tokens-per-minute budget."""
+
+    max_requests_per_minute: float
+    max_tokens_per_minute: float
+    available_request_capacity: float = 0
+    available_token_capacity: float = 0
+    last_update_time: float = 0
+
+    def __post_init__(self):
+        self.available_request_capacity = self.max_requests_per_minute
+        self.available_token_capacity = self.max_tokens_per_minute
+        self.last_update_time = time.time()
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until there is capacity for one request of the given number of tokens."""
+        # A request larger than the whole budget waits for a full bucket.
+        tokens = min(tokens, self.max_tokens_per_minute)
+
+        while True:
+            current_time = time.time()
+            seconds_since_update = current_time - self.last_update_time
+            self.available_request_capacity = min(
+                self.available_request_capacity + self.max_requests_per_minute * seconds_since_update / 60.0,
+                self.max_requests_per_minute,
+            )
+            self.available_token_capacity = min(
+                self.available_token_capacity + self.max_tokens_per_minute * seconds_since_update / 60.0,
+                self.max_tokens_per_minute,
+            )
+            self.last_update_time = current_time
+
+            if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                self.available_request_capacity -= 1
+                self.available_token_capacity -= tokens
+                return
+
+            await asyncio.sleep(0.1)
+
+
+
+async def _index_batches(
+    batches: List[List[Dict[str, Any]]],
+    ef: JinaEmbeddingFunction,
+    max_in_flight: int,
+    max_requests_per_minute: float,
+    max_tokens_per_minute: float,
+    backend: str = "milvus"
+) -> IndexingTracker:
+    """
+    Embed the batches concurrently and insert them into Milvus, or Postgres, as they are embedded.
+    """
+    tracker = IndexingTracker()
+    rate_limiter = RateLimiter(max_requests_per_minute, max_tokens_per_minute)
+    semaphore = asyncio.Semaphore(max_in_flight)
+    # Bounded, so embedded batches don't pile up in memory when Milvus is the bottleneck.
+    embedded_batches = asyncio.Queue(maxsize = max_in_flight)
+    progress_bar = tqdm(total = len(batches), desc = f"----Indexing {vector_schema['collection_name']}...")
+    started_at = time.perf_counter()
+
+    async def embed(batch_data: List[Dict[str, Any]]) -> None:
+        texts = [doc[vector_schema['values']['vector_col']] for doc in batch_data]
+        async with semaphore:
+            await rate_limiter.acquire(sum(len(encoding.encode(text)) for text in texts))
+            requested_at = time.perf_counter()
+            devcs = await ef.aencode_documents(texts)
+            tracker.embedding_seconds += time.perf_counter() - requested_at
+            # Hold the slot until the writer takes the batch, so a slow writer throttles the embedding.
+            await embedded_batches.put((batch_data, devcs))
+
+    async def insert() -> None:
+        while True:
+            item = await embedded_batches.get()
+            if item is None:
+                return
+
+            batch_data, devcs = item
+            inserting_at = time.perf_counter()
+            if backend == "pgvector":
+                # pgvector stores the float32 vectors, whatever the Milvus vector type.
+                await asyncio.to_thread(
+                    RocloPostgresDatabase._insert_embeddings,
+                    pgvector_schema,
+                    [{**batch_data[i], "embedding":devcs[i]} for i in range(len(batch_data))]
+                )
+            else:
+                vector_data = [
+                    {**{k: batch_data[i][k] for k in vector_schema['values']['metadata']}, "vector":encode_vector(devcs[i], vector_schema['values']['vector_type'])}
+                    for i in range(len(batch_data))
+                ]
+                await asyncio.to_thread(
+                    RocloMilvusVectorDB.insert_data,
+                    collection_name=vector_schema['collection_name'],
+                    data = vector_data
+                )
+            tracker.insert_seconds += time.perf_counter() - inserting_at
+            tracker.num_documents += len(batch_data)
+            progress_bar.update(1)
+
+    async def embed_all() -> None:
+        await asyncio.gather(*(embed(batch_data) for batch_data in batches))
+        await embedded_batches.put(None)
+
+    # A failure in either stage stops the pipeline, asyncio.run cancels the pending tasks.
+    try:
+        await asyncio.gather(embed_all(), insert())
+    finally:
+        await ef.aclose()
+        progress_bar.close()
+
+    tracker.total_seconds = time.perf_counter() - started_at
+    return tracker
@@ -23,6 +23,7 @@ except Exception as e:
 
 from kg_population.data_loader import load_sql_data_from_related_tables
 from utils import postgres_table_schema
+from kg_population.vector_calculator.vector_schmea import vector_schema
 from kg_population.vector_indexer import index_vector
 # from kg_population.vector_indexer import index_vector
 
@@ -40,7 +41,14 @@ def main() -> None:
     RocloPostgresDatabase._create_table(postgres_table_schema)
 
     # Insert data
-    RocloPostgresDatabase._insert_data(postgres_table_schema, data)
+    RocloPostgresDatabase._bulk_insert_data(postgres_table_schema, data)
+
+    # Invalidate the chatbot's cached query results.
+    RocloPostgresDatabase.bump_data_version(postgres_table_schema['table_name'])
+
+    # With the pgvector backend, the description vectors live next to the deals.
+    if vector_schema['backend'] == "pgvector":
+        index_vector(data)
     
     logging.getLogger('main').info("Completed Postgres Construction.")
 
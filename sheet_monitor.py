@@ -1,8 +1,10 @@
 from config import Credentials
 from core import (
     RocloPostgresDatabase,
+    RocloMilvusVectorDB,
     RocloSheetProvider
 )
+from kg_population.vector_calculator.vector_schmea import vector_schema
 from logger import setup_logger
 import logging
 
@@ -11,6 +13,8 @@ import time
 
 from typing import List, Dict, Any, Tuple
 import datetime
+import hashlib
+import json
 
 # Initialize the core functionalities.
 try:
@@ -20,12 +24,15 @@ try:
     Credentials.set_secrets()
     RocloSheetProvider.connect()
     RocloPostgresDatabase.connect()
-    # RocloMilvusVectorDB.connect()
+    # The changed deals are re-indexed, Milvus is only needed with its backend.
+    if vector_schema['backend'] == "milvus":
+        RocloMilvusVectorDB.connect()
 except Exception as e:
     print(e)
     exit()
 
 from utils import postgres_table_schema, oaklins_keys_types
+from kg_population.vector_indexer import index_vector
 
 # Function to convert individual value to its proper type
 def convert_value(val: Any, typ: type) -> Any:
@@ -74,12 +81,85 @@ def convert_to_dicts(data: List[List[Any]], keys_types: List[Tuple[str, type]])
     return result
 
 
+# Hash the converted deal, so unchanged deals can be skipped
+def hash_row(row: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# Set when the description vectors are behind the synced deals, so the next job re-indexes them.
+reindex_pending = False
+
+
 def job():
+    global reindex_pending
+
     data = RocloSheetProvider.get_deals()
-    converted_dict = convert_to_dicts(data, oaklins_keys_types)
-    RocloPostgresDatabase._insert_data(postgres_table_schema, converted_dict)
 
-    logging.getLogger('main').info(f"Executed job: {len(converted_dict)} deals updated.")
+    # Don't treat a failed or empty read as every deal being deleted.
+    if not data:
+        logging.getLogger('main').info("Executed job: no deals received from the sheet, skipped.")
+        return
+
+    converted_dict = [row for row in convert_to_dicts(data, oaklins_keys_types) if row['deal_id'] is not None]
+
+    # A deal repeated in the sheet is written once, the last row wins as in the upsert.
+    converted_dict = list({row['deal_id']: row for row in converted_dict}.values())
+
+    # Diff the content hashes against the last synced state.
+    current_hashes = {row['deal_id']: hash_row(row) for row in converted_dict}
+    stored_hashes = RocloPostgresDatabase._get_content_hashes(postgres_table_schema)
+
+    inserted_ids = [deal_id for deal_id in current_hashes if deal_id not in stored_hashes]
+    changed_ids = [deal_id for deal_id in current_hashes if deal_id in stored_hashes and stored_hashes[deal_id] != current_hashes[deal_id]]
+    deleted_ids = [deal_id for deal_id in stored_hashes if deal_id not in current_hashes]
+
+    # Write only the inserted, changed and deleted deals.
+    written_ids = set(inserted_ids) | set(changed_ids)
+    upserted = RocloPostgresDatabase._insert_data(
+        postgres_table_schema,
+        [row for row in converted_dict if row['deal_id'] in written_ids]
+    )
+
+    # A truncated sheet read looks like many deleted deals, don't delete them.
+    deletions_skipped = False
+    if len(deleted_ids) > postgres_table_schema['sync_max_deleted_ratio'] * len(stored_hashes):
+        logging.getLogger('main').warning(
+            f"{len(deleted_ids)} of {len(stored_hashes)} synced deals are missing from the sheet, "
+            f"more than {postgres_table_schema['sync_max_deleted_ratio']:.0%}: deletions skipped."
+        )
+        deleted_ids = []
+        deletions_skipped = True
+    deleted = RocloPostgresDatabase._delete_data(postgres_table_schema, deleted_ids)
+
+    # Keep the old hashes if the upsert failed, so the deals are retried by the next job.
+    if upserted == len(written_ids):
+        RocloPostgresDatabase._update_content_hashes(
+            postgres_table_schema,
+            {deal_id: current_hashes[deal_id] for deal_id in written_ids},
+            deleted_ids
+        )
+    else:
+        logging.getLogger('main').info(f"Only {upserted} of {len(written_ids)} deals were upserted, they will be retried.")
+
+    # Invalidate the chatbot's cached query results.
+    if upserted or deleted:
+        RocloPostgresDatabase.bump_data_version(postgres_table_schema['table_name'])
+
+    # Embed the new and changed descriptions, and remove the vectors of the changed and deleted ones.
+    # The re-index would also remove the vectors of the deals whose deletion was skipped, so it waits.
+    reindex_pending = reindex_pending or bool(written_ids or deleted_ids)
+    if reindex_pending and not deletions_skipped:
+        try:
+            index_vector(converted_dict, incremental = True)
+            reindex_pending = False
+        except Exception as e:
+            # The descriptions already indexed are skipped by their content hash when retried.
+            logging.getLogger('main').error(f"Failed to re-index the deal descriptions, retrying with the next job: {e}")
+
+    logging.getLogger('main').info(
+        f"Executed job: {len(inserted_ids)} deals inserted, {len(changed_ids)} changed, "
+        f"{len(deleted_ids)} deleted, {len(converted_dict) - len(written_ids)} unchanged."
+    )
 
 schedule.every(1).minutes.do(job)
 
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pymilvus")
+ml_dtypes = pytest.importorskip("ml_dtypes")
+
+from kg_population.vector_calculator.vector_schmea import encode_query_vector
+
+
+@pytest.mark.parametrize("vector_type, expected", [
+    ("FLOAT16", np.float16),
+    ("BFLOAT16", ml_dtypes.bfloat16),
+])
+def test_half_precision_query_is_an_array_of_its_dtype(vector_type, expected):
+    data = encode_query_vector(np.linspace(-1, 1, 16), vector_type)
+
+    assert isinstance(data, np.ndarray)
+    assert data.dtype == np.dtype(expected)
+    assert data.shape == (16,)
+
+
+def test_binary_query_is_packed_bytes():
+    data = encode_query_vector(np.linspace(-1, 1, 16), "BINARY")
+
+    assert isinstance(data, bytes)
+    assert len(data) == 2
+
+
+def test_float_query_is_a_list():
+    assert isinstance(encode_query_vector(np.ones(4), "FLOAT"), list)
+
+
+def test_search_placeholder_type_matches_the_storage_type():
+    from pymilvus.client.prepare import Prepare
+    from pymilvus.grpc_gen import common_pb2
+
+    expected = {
+        "FLOAT": common_pb2.PlaceholderType.FloatVector,
+        "FLOAT16": common_pb2.PlaceholderType.Float16Vector,
+        "BFLOAT16": common_pb2.PlaceholderType.BFloat16Vector,
+        "BINARY": common_pb2.PlaceholderType.BinaryVector,
+    }
+    for vector_type, placeholder_type in expected.items():
+        data = [encode_query_vector(np.linspace(-1, 1, 16), vector_type)]
+        placeholder = common_pb2.PlaceholderGroup.FromString(Prepare._prepare_placeholder_str(data))
+        assert placeholder.placeholders[0].type == placeholder_type, vector_type
@@ -22,4 +22,4 @@ from utils.utils import (
     get_business_descriptions_for_oaklins
 )
 from utils.related_tables import related_tables
-from utils.metadata import description_sections, postgres_table_schema, oaklins_keys_types
\ No newline at end of file
+from utils.metadata import description_sections, postgres_table_schema, oaklins_keys_types, postgres_query_limits, pre_router_config, history_policies
\ No newline at end of file
@@ -59,6 +59,10 @@ oaklins_keys_types: List[Tuple[str, type]] = [
 # Postgres Table Scehma
 postgres_table_schema = {
     "table_name": "oaklins_deals",
+    # Content hash per deal, used by the sheet monitor to write only the changed deals.
+    "sync_state_table": "oaklins_deals_sync_state",
+    # Largest share of the synced deals one sync may delete, a bigger drop is taken for a partial sheet read.
+    "sync_max_deleted_ratio": 0.1,
     "creation_sql": """
         CREATE TABLE oaklins_deals (
             deal_id SERIAL PRIMARY KEY,
@@ -102,13 +106,102 @@ postgres_table_schema = {
             oaklins_main_contact TEXT,
             oaklins_main_contact_email TEXT,
             oaklins_other_members_involved TEXT,
-            sector_commentary TEXT
+            sector_commentary TEXT,
+            search_document TSVECTOR GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(target_industry, '') || ' ' || coalesce(target_sector, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(buyer_industry, '') || ' ' || coalesce(buyer_sector, '') || ' ' ||
+                    coalesce(seller_industry, '') || ' ' || coalesce(seller_sector, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(target_business_description, '')), 'C') ||
+                setweight(to_tsvector('english', coalesce(buyer_business_description, '') || ' ' ||
+                    coalesce(seller_business_description, '')), 'D')
+            ) STORED,
+            search_text TEXT GENERATED ALWAYS AS (
+                coalesce(target_industry, '') || E'\\x1f' || coalesce(target_sector, '') || E'\\x1f' ||
+                coalesce(target_business_description, '') || E'\\x1f' || coalesce(buyer_industry, '') || E'\\x1f' ||
+                coalesce(buyer_sector, '') || E'\\x1f' || coalesce(buyer_business_description, '') || E'\\x1f' ||
+                coalesce(seller_industry, '') || E'\\x1f' || coalesce(seller_sector, '') || E'\\x1f' ||
+                coalesce(seller_business_description, '')
+            ) STORED
         );
     """,
     "index_sql": """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
         CREATE INDEX IF NOT EXISTS idx_deal_id ON oaklins_deals(deal_id);
-        CREATE INDEX IF NOT EXISTS idx_target_desc ON oaklins_deals(target_business_description);
-        CREATE INDEX IF NOT EXISTS idx_buyer_desc ON oaklins_deals(buyer_business_description);
-        CREATE INDEX IF NOT EXISTS idx_seller_desc ON oaklins_deals(seller_business_description);
-    """
-}
\ No newline at end of file
+        CREATE INDEX IF NOT EXISTS idx_search_document ON oaklins_deals USING GIN (search_document);
+        CREATE INDEX IF NOT EXISTS idx_search_text_trgm ON oaklins_deals USING GIN (search_text gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_target_industry_trgm ON oaklins_deals USING GIN (target_industry gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_target_sector_trgm ON oaklins_deals USING GIN (target_sector gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_target_desc_trgm ON oaklins_deals USING GIN (target_business_description gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_buyer_industry_trgm ON oaklins_deals USING GIN (buyer_industry gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_buyer_sector_trgm ON oaklins_deals USING GIN (buyer_sector gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_buyer_desc_trgm ON oaklins_deals USING GIN (buyer_business_description gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_seller_industry_trgm ON oaklins_deals USING GIN (seller_industry gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_seller_sector_trgm ON oaklins_deals USING GIN (seller_sector gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_seller_desc_trgm ON oaklins_deals USING GIN (seller_business_description gin_trgm_ops);
+    """,
+    # Generated search columns, dropped from the retrieved data.
+    "search_columns": ["search_document", "search_text"],
+    # Columns concatenated into search_text, joined by the separator.
+    "search_text_columns": [
+        "target_industry",
+        "target_sector",
+        "target_business_description",
+        "buyer_industry",
+        "buyer_sector",
+        "buyer_business_description",
+        "seller_industry",
+        "seller_sector",
+        "seller_business_description"
+    ],
+    "search_text_separator": "\x1f"
+}
+postgres_query_limits = {
+    # Maximum number of rows the retriever hands to the augmenters.
+    "max_rows": 100,
+    # Planner estimates above which a generated query is rejected before it runs.
+    "max_total_cost": 1000000,
+    "max_plan_rows": 10000
+}
+
+# Pre-router in front of the rational planner: trivial messages go straight to the plain augmenter.
+pre_router_config = {
+    # Messages made only of these phrases (and punctuation or emojis) are trivial.
+    "trivial_patterns": [
+        r"(hi|hello|hey|good (morning|afternoon|evening)|greetings)( there)?",
+        r"(thanks|thank you|thx|cheers|great|perfect|awesome|nice|cool)( (so|very) much)?",
+        r"(bye|goodbye|see you|have a (nice|good) day)",
+        r"(how are you|who are you|what can you do|what are you|help)",
+    ],
+    # Examples of the two classes, for the embedding classifier of the other messages.
+    "trivial_examples": [
+        "Hello, how are you doing today?",
+        "Thanks a lot for your help!",
+        "What kind of questions can you answer?",
+        "Who built you?",
+        "Good morning, nice to meet you.",
+    ],
+    "data_examples": [
+        "Which deals did we close in the footwear sector?",
+        "Show me the transactions where the target is in Germany.",
+        "List the buyers of software companies in 2023.",
+        "What was the amount raised in the latest fundraising?",
+        "Who was the main Oaklins contact on the deal with this company?",
+    ],
+    # A message is trivial if it is closer to the trivial examples than to the data examples
+    # by this margin, and at least this similar to one of them.
+    "margin": 0.1,
+    "min_similarity": 0.6,
+    # Longer messages always go to the planner.
+    "max_words": 12,
+}
+
+# Chat history shown to each chain: the latest max_turns turns within max_tokens (cl100k tokens),
+# the older turns summarized if summarize is set. The augmenters' turns carry the retrieved data.
+history_policies = {
+    "rational_planner": {"max_turns": 10, "max_tokens": 6000, "summarize": True},
+    "query_generator": {"max_turns": 6, "max_tokens": 4000, "summarize": False},
+    "prioritizer": {"max_turns": 4, "max_tokens": 2000, "summarize": False},
+    "result_augmenter": {"max_turns": 4, "max_tokens": 12000, "summarize": True},
+    "table_augmenter": {"max_turns": 4, "max_tokens": 12000, "summarize": True},
+    "plain_augmenter": {"max_turns": 4, "max_tokens": 12000, "summarize": True},
+}
@@ -0,0 +1,246 @@
+import argparse
+import os
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from pymilvus import DataType, MilvusClient
+
+from kg_population.vector_calculator.vector_schmea import (
+    get_vector_index,
+    vector_index_presets,
+    vector_storage_types,
+    vector_schema,
+    encode_vector,
+    decode_vector
+)
+
+DEFAULT_URI = "./vector_benchmark.db"
+
+# Index types Milvus Lite builds, it falls back to FLAT for the others.
+LITE_INDEX_TYPES = ["FLAT", "IVF_FLAT"]
+
+
+def is_lite_uri(uri: str) -> bool:
+    """Check whether the URI is a local file served by Milvus Lite, rather than a Milvus server."""
+    return "://" not in uri
+
+
+def make_corpus(num_vectors: int, num_queries: int, dim: int, seed: int = 0):
+    """
+    Build a synthetic corpus of normalized vectors.
+
+    The vectors are drawn around a few hundred cluster centers, which is closer to real
+    description embeddings than uniform noise and makes the ANN indexes work for their recall.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size = (max(num_vectors // 100, 1), dim))
+
+    def sample(size: int) -> np.ndarray:
+        vectors = centers[rng.integers(0, len(centers), size)] + 0.5 * rng.normal(size = (size, dim))
+        return (vectors / np.linalg.norm(vectors, axis = 1, keepdims = True)).astype(np.float32)
+
+    return sample(num_vectors), sample(num_queries)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    """Ground truth: the ids of the top_k cosine neighbours, as a FLAT index returns them."""
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis = 1)[:, :top_k]
+
+
+def load_corpus(path: str, num_queries: int, seed: int = 0):
+    """
+    Split real embeddings, e.g. the vectors.npy of the local vector store, into a corpus and held out queries.
+    """
+    vectors = np.load(path).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis = 1, keepdims = True)
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[order[num_queries:]], vectors[order[:num_queries]]
+
+
+def estimate_index_bytes(index_type: str, dim: int) -> float:
+    """
+    Rough memory of one vector in the index: the raw or quantized vector plus the graph links of HNSW.
+    """
+    build = vector_index_presets[index_type]["build"]
+    if index_type == "HNSW":
+        return dim * 4 + build["M"] * 2 * 4
+    if index_type == "IVF_SQ8":
+        return dim
+    if index_type == "IVF_PQ":
+        return build["m"] * build["nbits"] / 8
+    if index_type == "SCANN":
+        return dim / 2 + (dim * 4 if build.get("with_raw_data") else 0)
+    return dim * 4
+
+
+def benchmark_index(
+    client: MilvusClient,
+    index_type: str,
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    ground_truth: np.ndarray,
+    top_k: int
+) -> Dict[str, Any]:
+    """
+    Index the corpus with the index type and measure the recall@k and the search latency.
+    """
+    collection_name = f"benchmark_{index_type.lower()}"
+    if client.has_collection(collection_name):
+        client.drop_collection(collection_name)
+
+    schema = MilvusClient.create_schema(auto_id = False, enable_dynamic_field = False)
+    schema.add_field(field_name = "id", datatype = DataType.INT64, is_primary = True)
+    schema.add_field(field_name = "vector", datatype = DataType.FLOAT_VECTOR, dim = corpus.shape[1])
+    client.create_collection(collection_name = collection_name, schema = schema)
+
+    for i in range(0, len(corpus), 1000):
+        client.insert(
+            collection_name = collection_name,
+            data = [{"id": i + j, "vector": vector} for j, vector in enumerate(corpus[i:i+1000])]
+        )
+
+    index_param, search_param = get_vector_index(index_type)
+    index_params = MilvusClient.prepare_index_params()
+    index_params.add_index(**index_param)
+
+    started_at = time.perf_counter()
+    client.create_index(collection_name = collection_name, index_params = index_params, sync = True)
+    client.load_collection(collection_name)
+    build_seconds = time.perf_counter() - started_at
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, ground_truth):
+        requested_at = time.perf_counter()
+        result = client.search(
+            collection_name = collection_name,
+            data = [query.tolist()],
+            limit = top_k,
+            search_params = search_param
+        )[0]
+        latencies.append((time.perf_counter() - requested_at) * 1000)
+        hits += len({hit['id'] for hit in result} & set(expected.tolist()))
+
+    client.drop_collection(collection_name)
+
+    return {
+        "index_type": index_type,
+        "bytes_per_vector": estimate_index_bytes(index_type, corpus.shape[1]),
+        "build_seconds": build_seconds,
+        f"recall@{top_k}": hits / (len(queries) * top_k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def benchmark_storage(
+    vector_type: str,
+    dimensions: int,
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    ground_truth: np.ndarray,
+    top_k: int
+) -> Dict[str, Any]:
+    """
+    Measure the ranking quality of a vector storage type and a Matryoshka dimension against
+    the full precision, full dimension ranking, with exact search.
+
+    Lower dimensions keep the leading dimensions, renormalized, as the Jina API does. This is
+    only meaningful for Matryoshka embeddings, so use real vectors with --vectors.
+    """
+    def store(vectors: np.ndarray) -> np.ndarray:
+        vectors = vectors[:, :dimensions]
+        vectors = vectors / np.linalg.norm(vectors, axis = 1, keepdims = True)
+        return np.stack([decode_vector(encode_vector(vector, vector_type), vector_type) for vector in vectors])
+
+    # BINARY vectors decode to -1/+1, so the dot product ranks by Hamming distance.
+    scores = store(queries) @ store(corpus).T
+    result = np.argsort(-scores, axis = 1)[:, :top_k]
+    hits = sum(len(set(found) & set(expected)) for found, expected in zip(result.tolist(), ground_truth.tolist()))
+    top_1 = float(np.mean(result[:, 0] == ground_truth[:, 0]))
+
+    bytes_per_vector = dimensions * vector_storage_types[vector_type]["bits"] / 8
+    return {
+        "vector_type": vector_type,
+        "dimensions": dimensions,
+        "bytes_per_vector": bytes_per_vector,
+        "mb_per_100k": bytes_per_vector * 100000 / 2**20,
+        f"recall@{top_k}": hits / (len(queries) * top_k),
+        "top_1_match": top_1,
+    }
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    """Print the results as an aligned table."""
+    columns = list(rows[0].keys())
+    cells = [[f"{row[column]:.4f}" if isinstance(row[column], float) else str(row[column]) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(cell[i]) for cell in cells)) for i, column in enumerate(columns)]
+
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for cell in cells:
+        print("  ".join(value.ljust(width) for value, width in zip(cell, widths)))
+
+
+def main() -> None:
+    """
+    Benchmark the storage of the description vectors against exact, full precision ground truth.
+
+    --mode index compares the ANN index types on recall, latency and memory. Milvus Lite (the default,
+    a local file) only builds FLAT and IVF_FLAT indexes and falls back to FLAT for the others, so the
+    other index types are skipped; pass the URI of a Milvus standalone server to benchmark HNSW, IVF_SQ8, etc.
+
+    --mode storage compares the vector types and Matryoshka dimensions on memory and ranking quality,
+    in process. Run it on real embeddings with --vectors, synthetic vectors have no Matryoshka structure.
+    """
+    parser = argparse.ArgumentParser(description = "Memory, recall and latency of the Milvus vector storage options.")
+    parser.add_argument("--mode", default = "index", choices = ["index", "storage"])
+    parser.add_argument("--uri", default = DEFAULT_URI, help = "Milvus URI, a local file for Milvus Lite.")
+    parser.add_argument("--vectors", help = "A .npy file of real embeddings, instead of synthetic vectors.")
+    parser.add_argument("--index-types", nargs = "+", default = ["FLAT", "IVF_FLAT", "IVF_SQ8", "IVF_PQ", "HNSW"], choices = [index_type for index_type in vector_index_presets if not index_type.startswith("BIN_")])
+    parser.add_argument("--vector-types", nargs = "+", default = list(vector_storage_types), choices = list(vector_storage_types))
+    parser.add_argument("--dimensions", nargs = "+", type = int, default = [1024, 512, 256])
+    parser.add_argument("--num-vectors", type = int, default = 20000)
+    parser.add_argument("--num-queries", type = int, default = 200)
+    parser.add_argument("--dim", type = int, default = vector_schema['values']['dimensions'])
+    parser.add_argument("--top-k", type = int, default = 10)
+    args = parser.parse_args()
+
+    if args.mode == "index" and is_lite_uri(args.uri):
+        skipped = [index_type for index_type in args.index_types if index_type not in LITE_INDEX_TYPES]
+        args.index_types = [index_type for index_type in args.index_types if index_type in LITE_INDEX_TYPES]
+        if not args.index_types:
+            parser.error(f"Milvus Lite ({args.uri}) only builds {', '.join(LITE_INDEX_TYPES)}, pass the URI of a Milvus server.")
+        if skipped:
+            print(f"Skipping {', '.join(skipped)}: Milvus Lite ({args.uri}) would build FLAT instead. Pass the URI of a Milvus server to benchmark them.")
+
+    if args.vectors:
+        corpus, queries = load_corpus(args.vectors, args.num_queries)
+    else:
+        corpus, queries = make_corpus(args.num_vectors, args.num_queries, args.dim)
+    ground_truth = exact_top_k(corpus, queries, args.top_k)
+
+    results = []
+    if args.mode == "storage":
+        for vector_type in args.vector_types:
+            for dimensions in args.dimensions:
+                if dimensions > corpus.shape[1]:
+                    continue
+                print(f"Benchmarking {vector_type} at {dimensions} dimensions...", flush = True)
+                results.append(benchmark_storage(vector_type, dimensions, corpus, queries, ground_truth, args.top_k))
+    else:
+        client = MilvusClient(uri = args.uri)
+        for index_type in args.index_types:
+            print(f"Benchmarking {index_type}...", flush = True)
+            results.append(benchmark_index(client, index_type, corpus, queries, ground_truth, args.top_k))
+        client.close()
+
+        if args.uri == DEFAULT_URI and os.path.exists(args.uri):
+            os.remove(args.uri)
+
+    print_table(results)
+
+
+
+if __name__ == '__main__':
+    main()